@@ -1,8 +1,15 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    READ_DATABASE_URL: Optional[str] = None
+    READ_AFTER_WRITE_PIN_SECONDS: int = 5
+    READ_AFTER_WRITE_MAX_PINS: int = 10000
+    # Only for two local SQLite files: how often the primary is copied over the replica
+    READ_REPLICA_SYNC_SECONDS: float = 2.0
 
     # JWT Security
     SECRET_KEY: str
@@ -19,6 +26,56 @@ class Settings(BaseSettings):
     API_PORT: int
     DEBUG: bool
 
+    # Catalog cache
+    CATALOG_CACHE_MAX_SIZE: int = 1024
+    CATALOG_CACHE_TTL_SECONDS: int = 300
+    PRODUCT_BATCH_MAX_IDS: int = 100
+    PRODUCT_CACHE_MAX_AGE_SECONDS: int = 60
+    PRODUCT_FACET_PRICE_BUCKET_SIZE: float = 50
+    CATALOG_VERSION_CHECK_SECONDS: float = 1.0
+
+    # Catalog import
+    CATALOG_CSV_PATH: str = "items.csv"
+    CATALOG_IMPORT_BATCH_SIZE: int = 1000
+
+    # Idempotency keys
+    IDEMPOTENCY_CACHE_MAX_SIZE: int = 1024
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_PENDING_TIMEOUT_SECONDS: int = 60
+
+    # Stale order sweeper
+    ORDER_SWEEPER_ENABLED: bool = True
+    ORDER_EXPIRY_TTL_SECONDS: int = 1800
+    ORDER_SWEEPER_INTERVAL_SECONDS: int = 60
+    ORDER_SWEEPER_BATCH_SIZE: int = 500
+
+    # Asynchronous payment queue
+    PAYMENT_QUEUE_MAX_SIZE: int = 1000
+    PAYMENT_QUEUE_WORKERS: int = 4
+    PAYMENT_QUEUE_SHUTDOWN_TIMEOUT_SECONDS: float = 30.0
+    PAYMENT_JOB_CACHE_SIZE: int = 10000
+    PAYMENT_JOB_TTL_SECONDS: int = 3600
+
+    # Payment status events (memory: single process, database: polls for multi-worker setups)
+    PAYMENT_EVENTS_BROKER: str = "memory"
+    PAYMENT_EVENTS_POLL_INTERVAL_SECONDS: float = 1.0
+    PAYMENT_EVENTS_TIMEOUT_SECONDS: int = 30
+    PAYMENT_EVENTS_HEARTBEAT_SECONDS: int = 15
+
+    # Shared secret the gateway signs settlement callbacks with, callbacks are refused while unset
+    PAYMENT_CALLBACK_SECRET: Optional[str] = None
+
+    # Payment gateway (mock: in-process stub, http: remote gateway, see mock_gateway.py)
+    PAYMENT_GATEWAY: str = "mock"
+    PAYMENT_GATEWAY_URL: str = "http://127.0.0.1:8030"
+    PAYMENT_GATEWAY_TIMEOUT_SECONDS: float = 5.0
+    PAYMENT_GATEWAY_CONNECT_TIMEOUT_SECONDS: float = 2.0
+    PAYMENT_GATEWAY_MAX_CONNECTIONS: int = 100
+    PAYMENT_GATEWAY_MAX_RETRIES: int = 2
+    PAYMENT_GATEWAY_RETRY_BACKOFF_SECONDS: float = 0.2
+    PAYMENT_GATEWAY_BREAKER_FAILURES: int = 5
+    PAYMENT_GATEWAY_BREAKER_RESET_SECONDS: float = 30.0
+
     class Config:
         env_file = ".env"  # Load from .env
 
@@ -7,6 +7,10 @@ engine = create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Read replica, reads go to the primary when it is not configured
+read_engine = create_engine(settings.READ_DATABASE_URL) if settings.READ_DATABASE_URL else engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 
 def get_db():
     db = SessionLocal()
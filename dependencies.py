@@ -1,35 +1,90 @@
 from typing import Any
 from fastapi import Request
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, Header, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials
 from passlib.ifc import PasswordHash
 
 from sqlalchemy.orm import Session
-from database import get_db
+from config.setting import settings
+from database import ReadSessionLocal, engine, get_db, read_engine
 from modles.users_models import User
 from services.auth_service import AuthService
+from services.idempotency_service import IdempotencyService
 from services.order_service import OrderService
+from services.payment_gateway import PaymentGateway, payment_gateway
+from services.payment_queue_service import PaymentQueue, payment_queue
 from services.payment_service import PaymentService
 from services.products_service import ProductService
 from utils import security
+from utils.lru_cache import LRUCache
 from utils.password_hasher import Hasher
-from utils.security import decode_token
+from utils.security import decode_token, verify_payload_signature
 
 
-def get_product_service(db: Session = Depends(get_db)) -> ProductService:
-    return ProductService(db)
+# Clients that wrote recently read from the primary until their pin expires, hiding replica lag
+primary_pins = LRUCache(max_size=settings.READ_AFTER_WRITE_MAX_PINS,
+                        ttl_seconds=settings.READ_AFTER_WRITE_PIN_SECONDS)
 
-def get_auth_service(db: Session = Depends(get_db)) -> AuthService:
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def client_key(request: Request) -> str:
+    """Identify the caller for read-after-write pinning: the token's user, else the client address"""
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        try:
+            return f"user:{decode_token(auth_header[7:]).get('user_id')}"
+        except Exception:
+            pass
+    return f"client:{request.client.host if request.client else 'unknown'}"
+
+
+def get_primary_db(request: Request, db: Session = Depends(get_db)) -> Session:
+    """The primary session, pinning the caller to the primary when the request may write"""
+    if read_engine is not engine and request.method not in SAFE_METHODS:
+        primary_pins.set(client_key(request), True)
+    return db
+
+
+def get_read_db(request: Request, db: Session = Depends(get_primary_db)):
+    """
+    Session for read-only paths: the replica, or the request's primary session
+    when no replica is configured or the caller wrote within READ_AFTER_WRITE_PIN_SECONDS
+    """
+    if read_engine is engine or primary_pins.get(client_key(request)):
+        yield db
+        return
+
+    read_db = ReadSessionLocal()
+    try:
+        yield read_db
+    finally:
+        read_db.close()
+
+
+def get_product_service(db: Session = Depends(get_primary_db), read_db: Session = Depends(get_read_db)) -> ProductService:
+    return ProductService(db, read_db=read_db)
+
+def get_auth_service(db: Session = Depends(get_primary_db)) -> AuthService:
     return AuthService(db)
 
-def get_order_service(db: Session = Depends(get_db)) -> OrderService:
-    return OrderService(db)
+def get_order_service(db: Session = Depends(get_primary_db), read_db: Session = Depends(get_read_db)) -> OrderService:
+    return OrderService(db, read_db=read_db)
+
+def get_payment_service(db: Session =Depends(get_primary_db), read_db: Session = Depends(get_read_db)) -> PaymentService:
+    return PaymentService(db, read_db=read_db)
+
+def get_idempotency_service(db: Session = Depends(get_primary_db)) -> IdempotencyService:
+    return IdempotencyService(db)
 
-def get_payment_service(db: Session =Depends(get_db) ) -> PaymentService:
-    return PaymentService(db)
+def get_payment_gateway() -> PaymentGateway:
+    return payment_gateway
 
-def get_current_user(db: Session = Depends(get_db), request: Request = None) -> type[User]:
+def get_payment_queue() -> PaymentQueue:
+    return payment_queue
+
+def get_current_user(db: Session = Depends(get_primary_db), request: Request = None) -> type[User]:
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Authorization header missing or invalid")
@@ -47,3 +102,16 @@ def get_current_user(db: Session = Depends(get_db), request: Request = None) ->
     return user
 
 
+
+
+async def verify_payment_callback_signature(
+        request: Request,
+        x_signature: str = Header(None, description="sha256=<hex HMAC-SHA256 of the body with the callback secret>")
+) -> None:
+    """Reject gateway callbacks that are not signed with PAYMENT_CALLBACK_SECRET, before the body is applied"""
+    if not settings.PAYMENT_CALLBACK_SECRET:
+        raise HTTPException(status_code=503,
+                            detail="Payment callbacks are disabled, PAYMENT_CALLBACK_SECRET is not set")
+    body = await request.body()
+    if not verify_payload_signature(settings.PAYMENT_CALLBACK_SECRET, body, x_signature):
+        raise HTTPException(status_code=401, detail="Invalid callback signature")
@@ -1,4 +1,3 @@
-import csv
 import os
 from contextlib import asynccontextmanager
 
@@ -10,16 +9,25 @@ from typing import List, Annotated
 
 from starlette.middleware.cors import CORSMiddleware
 
-from database import engine, SessionLocal, get_db, Base
+from database import engine, read_engine, SessionLocal, get_db
 from sqlalchemy.orm import Session
 
 from middlewares.audit_middleware import AuditMiddleware
 from middlewares.auth_middleware import AuthMiddleware
-from modles.product_models import Product
 from routers.products_router import router as products_router
 from routers.auth_router import router as auth_router
 from routers.orders_router import router as orders_router
 from routers.payment_router import router as payment_router
+from services.catalog_import_service import CatalogImportService
+from services.catalog_version_service import catalog_version_tracker
+from services.order_expiry_service import OrderSweeper
+from services.payment_gateway import payment_gateway
+from services.payment_queue_service import payment_queue
+from utils.payment_events import payment_events
+from utils.sqlite_replica import SqliteReplicaSync
+from schemas.api_response_schemas import success_response
+from config.setting import settings
+from utils.db_schema import ensure_schema
 from excpetions.global_exception_handler import (
     not_found_handler,
     validation_error_handler,
@@ -32,73 +40,58 @@ from fastapi import FastAPI, Request
 
 def populate_products_from_csv():
     """
-    Auto-populate products from CSV on startup
+    Import or refresh products from CSV on startup.
+    Unchanged files are skipped, changed files only apply the rows that differ.
     """
-    db = SessionLocal()
-
-    try:
-        csv_file_path = "items.csv"
-
-        # Check if file exists
-        if not os.path.exists(csv_file_path):
-            print(f"CSV file '{csv_file_path}' not found! Skipping auto-import.")
-            return
-
-        # Check if products already exist
-        existing_count = db.query(Product).count()
-        if existing_count > 0:
-            print(f" Found {existing_count} existing products. Skipping CSV import.")
-            return
-
-        print("No products found. Starting CSV import...")
+    csv_file_path = settings.CATALOG_CSV_PATH
 
-        products_created = 0
-
-        with open(csv_file_path, 'r', encoding='utf-8') as file:
-            csv_reader = csv.DictReader(file)
-
-            for row in csv_reader:
-                try:
-                    product = Product(
-                        id=int(row['id']),
-                        title=row['title'].strip(),
-                        description=row['description'].strip(),
-                        price=float(row['price']),
-                        location=row['location'].strip()
-                    )
-
-                    db.add(product)
-                    products_created += 1
-
-                except Exception as e:
-                    print(f" Error processing row {row}: {e}")
-                    continue
-
-        db.commit()
-        print(f"Successfully imported {products_created} products on startup!")
+    # Check if file exists
+    if not os.path.exists(csv_file_path):
+        print(f"CSV file '{csv_file_path}' not found! Skipping auto-import.")
+        return
 
+    db = SessionLocal()
+    try:
+        CatalogImportService(db).import_csv(csv_file_path)
     except Exception as e:
         print(f" Error during startup import: {e}")
-        db.rollback()
     finally:
         db.close()
 
 
+# Expires orders that were never paid, started from the lifespan
+order_sweeper = OrderSweeper(SessionLocal)
+# Keeps a local SQLite read replica in step with the primary, idle otherwise
+replica_sync = SqliteReplicaSync(engine, read_engine)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("🌟 FastAPI application is starting up...")
 
-    # Create tables
-    Base.metadata.create_all(bind=engine)
+    # Create missing tables and indexes
+    ensure_schema(engine)
 
     # Auto-import CSV data
     populate_products_from_csv()
+    replica_sync.start()
+
+    if settings.ORDER_SWEEPER_ENABLED:
+        order_sweeper.start()
+    await payment_gateway.start()
+    payment_queue.start()
+    payment_events.start()
 
     yield
 
     # Shutdown
     print("FastAPI application is shutting down...")
+    await payment_events.stop()
+    await payment_queue.stop()
+    await payment_gateway.close()
+    await order_sweeper.stop()
+    await replica_sync.stop()
 
 
 app = FastAPI(lifespan=lifespan,
@@ -112,6 +105,26 @@ app.include_router(auth_router)
 app.include_router(orders_router)
 app.include_router(payment_router)
 
+
+
+@app.get("/health", tags=["health"], summary="Health Check")
+async def health():
+    """
+    Liveness check with background task, payment, catalog version and replica sync metrics
+    """
+    return success_response(
+        data={
+            "catalog_version": catalog_version_tracker.stats(),
+            "replica_sync": replica_sync.stats(),
+            "order_sweeper": order_sweeper.stats(),
+            "payment_queue": payment_queue.stats(),
+            "payment_events": payment_events.stats(),
+            "payment_gateway": payment_gateway.stats()
+        },
+        message="OK"
+    )
+
+
 app.add_middleware(AuthMiddleware)
 app.add_middleware(AuditMiddleware)
 app.add_middleware(
@@ -127,11 +140,8 @@ app.add_exception_handler(ValidationError, pydantic_validation_error_handler)
 app.add_exception_handler(HTTPException, http_exception_handler)
 app.add_exception_handler(Exception, general_exception_handler)
 
-Base.metadata.create_all(bind=engine)
-
 db_dependency = Annotated[Session, Depends(get_db)]
 if __name__ == "__main__":
-    from config.setting import settings
     uvicorn.run(
         "main:app",
         host=settings.API_HOST,
@@ -8,6 +8,10 @@ from modles.audit_models import AuditTrail
 from utils.security import decode_token
 
 
+# Streamed bodies are passed through untouched instead of being buffered for the audit record
+STREAMED_MEDIA_TYPES = ("application/x-ndjson", "text/csv", "text/event-stream")
+
+
 class AuditMiddleware(BaseHTTPMiddleware):
     def __init__(self, app, excluded_paths: list = None):
         super().__init__(app)
@@ -74,6 +78,11 @@ class AuditMiddleware(BaseHTTPMiddleware):
     async def get_response_body(self, response: Response) -> str:
         """Extract response body from different response types"""
         try:
+            media_type = response.headers.get("content-type", "").split(";")[0].strip()
+            if media_type in STREAMED_MEDIA_TYPES:
+                # Exports and event streams can be unbounded, don't hold them in memory
+                return f"[STREAMED {media_type}]"
+
             if isinstance(response, StreamingResponse):
                 # Handle StreamingResponse (most FastAPI responses)
                 response_body = b""
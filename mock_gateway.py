@@ -0,0 +1,61 @@
+"""
+Local stand-in for a remote payment gateway, for tests and benchmarks.
+
+Run it and point the API at it:
+    python mock_gateway.py
+    PAYMENT_GATEWAY=http PAYMENT_GATEWAY_URL=http://127.0.0.1:8030 python main.py
+
+MOCK_GATEWAY_LATENCY_MS adds a delay to every charge and MOCK_GATEWAY_ERROR_RATE
+(0-1) answers that share of charges with 503, to exercise timeouts, retries
+and the circuit breaker.
+"""
+import asyncio
+import os
+import random
+import string
+
+import uvicorn
+from fastapi import FastAPI, Header
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+LATENCY_MS = float(os.getenv("MOCK_GATEWAY_LATENCY_MS", "0"))
+ERROR_RATE = float(os.getenv("MOCK_GATEWAY_ERROR_RATE", "0"))
+
+app = FastAPI(title="Mock Payment Gateway")
+
+# Answers by Idempotency-Key, so a retried charge is never applied twice
+charges = {}
+
+
+class ChargeRequest(BaseModel):
+    amount: float
+    card_number: str
+    cvv: str
+    expiry_date: str
+    reference: str
+
+
+@app.post("/charges")
+async def charge(request: ChargeRequest, idempotency_key: str = Header(None)):
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000)
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        return JSONResponse(status_code=503, content={"error": "gateway temporarily unavailable"})
+
+    if idempotency_key and idempotency_key in charges:
+        return charges[idempotency_key]
+
+    result = {
+        "status": "DECLINED" if request.card_number.endswith("0000") else "APPROVED",
+        "transaction_reference": ''.join(random.choices(string.ascii_uppercase + string.digits, k=7)),
+        "reference": request.reference,
+        "amount": request.amount
+    }
+    if idempotency_key:
+        charges[idempotency_key] = result
+    return result
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("MOCK_GATEWAY_PORT", "8030")))
@@ -9,7 +9,7 @@ class AuditTrail(Base):
 
     id = Column(BigInteger, primary_key=True, index=True)
     user_id = Column(Integer, nullable=True, index=True)  # Nullable for public endpoints
-    creation_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    creation_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
     client_ip = Column(String(45), nullable=False)  # IPv6 support (45 chars max)
     method = Column(String(10), nullable=False)  # GET, POST, etc.
     endpoint = Column(String(255), nullable=False)  # Request path
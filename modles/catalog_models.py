@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime
+
+from database import Base
+
+
+class CatalogImport(Base):
+    __tablename__ = "catalog_imports"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=False, index=True)
+    rows_read = Column(Integer, nullable=False, default=0)
+    rows_inserted = Column(Integer, nullable=False, default=0)
+    rows_updated = Column(Integer, nullable=False, default=0)
+    rows_skipped = Column(Integer, nullable=False, default=0)
+    imported_at = Column(DateTime, default=datetime.now)
+
+
+class CatalogVersion(Base):
+    """
+    Single row bumped in the same transaction as every product write.
+    Shared by all processes, it is the validator behind product ETags.
+    """
+    __tablename__ = "catalog_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    token = Column(String(32), nullable=False)
+    updated_at = Column(DateTime, default=datetime.now)
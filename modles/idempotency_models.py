@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint
+
+from database import Base
+
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_records"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # Endpoint the key was used on, plus the user for authenticated endpoints
+    scope = Column(String, nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    # PENDING while the first request runs, COMPLETED once its response is stored
+    status = Column(String, nullable=False, default="PENDING")
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("scope", "key", name="uq_idempotency_records_scope_key"),
+    )
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, Float
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, Float, Index, text
 
 from database import Base
 from modles.product_models import Product
@@ -17,12 +17,40 @@ class Order(Base):
     trx_number = Column(String, nullable=True)
     status = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.now)
+    # Product as it was when the order was placed
+    product_title = Column(String, nullable=True)
+    product_description = Column(String, nullable=True)
+    product_location = Column(String, nullable=True)
+    unit_price = Column(Float, nullable=True)
+    # Set for checkout lines sharing one payment request
+    payment_id = Column(Integer, ForeignKey("payment_request.payment_id"), nullable=True, index=True)
+
+    __table_args__ = (
+        # Order history: WHERE user_id = ? ORDER BY created_at DESC, id DESC, also seeks by (created_at, id)
+        Index("ix_order_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Expiry sweeper: WHERE status = 'INITIATED' AND created_at < ? ORDER BY created_at
+        Index("ix_order_status_created_at", "status", "created_at"),
+    )
+
+
+class UserOrderSummary(Base):
+    """Per-user order aggregates, maintained in the same transaction as the orders they count"""
+    __tablename__ = 'user_order_summary'
+    user_id = Column(Integer, ForeignKey(User.id), primary_key=True)
+    total_orders = Column(Integer, nullable=False, default=0)
+    total_spent = Column(Float, nullable=False, default=0)
+    initiated_orders = Column(Integer, nullable=False, default=0)
+    successful_orders = Column(Integer, nullable=False, default=0)
+    failed_orders = Column(Integer, nullable=False, default=0)
+    expired_orders = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
 class PaymentRequest(Base):
     __tablename__ = 'payment_request'
     payment_id = Column(Integer, primary_key=True, autoincrement=True)
-    reference_id = Column(String , nullable=False)
+    reference_id = Column(String , nullable=False, index=True)
     price = Column(Float, nullable=False)
     status = Column(String, nullable=False)
     redirect_url = Column(String, nullable=False)
-    callback_url = Column(String, nullable=False)
\ No newline at end of file
+    callback_url = Column(String, nullable=False)
+    trx_number = Column(String, nullable=True)
\ No newline at end of file
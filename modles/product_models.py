@@ -1,4 +1,4 @@
-from sqlalchemy import  Boolean, Column, ForeignKey, Integer, String, Float
+from sqlalchemy import  Boolean, Column, ForeignKey, Integer, String, Float, Index
 from database import Base
 
 class Product(Base):
@@ -7,4 +7,9 @@ class Product(Base):
     title = Column(String)
     price = Column(Float)
     description = Column(String)
-    location = Column(String)
\ No newline at end of file
+    location = Column(String)
+
+    __table_args__ = (
+        # Location listings filter on location and page/seek by id
+        Index("ix_products_location_id", "location", "id"),
+    )
@@ -1,14 +1,24 @@
-from typing import Annotated
+from typing import Annotated, Literal, Optional
 
 import security
-from fastapi import APIRouter, Depends, Query, Security
+from fastapi import APIRouter, Depends, Header, Query, Security
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer
 
-from dependencies import get_order_service, get_current_user, get_product_service
+from dependencies import get_order_service, get_current_user, get_product_service, get_idempotency_service
 from modles.users_models import User
 from schemas.api_response_schemas import ApiResponse, PaginatedResponse, success_response, error_response
-from schemas.orders_schemas import CreateOrderRequest, PaymentCallback, InitiateOrderResponse, OrderResponse
-from services.order_service import OrderService
+from schemas.orders_schemas import (
+    CreateOrderRequest,
+    CheckoutRequest,
+    CheckoutResponse,
+    PaymentCallback,
+    InitiateOrderResponse,
+    OrderResponse,
+    OrderSummaryResponse
+)
+from services.idempotency_service import IdempotencyService
+from services.order_service import OrderService, EXPORT_MEDIA_TYPES
 from services.products_service import ProductService
 
 router = APIRouter(
@@ -21,6 +31,9 @@ security = HTTPBearer()
 order_service_dependency = Annotated[OrderService, Depends(get_order_service)]
 product_service_dependency = Annotated[ProductService, Depends(get_product_service)]
 current_user_dependency = Annotated[User, Depends(get_current_user)]
+idempotency_service_dependency = Annotated[IdempotencyService, Depends(get_idempotency_service)]
+
+IDEMPOTENCY_KEY_DESCRIPTION = "Unique key per logical request, retries with the same key are not executed twice"
 
 
 @router.post(
@@ -34,59 +47,204 @@ async def initiate(
         order_request: CreateOrderRequest,
         user: current_user_dependency,
         service: order_service_dependency,
-        product_service: product_service_dependency,
+        idempotency: idempotency_service_dependency,
+        idempotency_key: Optional[str] = Header(None, max_length=255, description=IDEMPOTENCY_KEY_DESCRIPTION),
 ) -> ApiResponse[InitiateOrderResponse]:
     """
     Initiate a new order and return payment URL
+
+    Send an `Idempotency-Key` header to make retries safe, duplicates get the first response back.
+    """
+    def action() -> ApiResponse[InitiateOrderResponse]:
+        try:
+            result = service.initiate(order_request, user)
+            return success_response(
+                data=result,
+                message="Order initiated successfully"
+            )
+        except ValueError as e:
+            return error_response(
+                message="Invalid order data",
+                errors=[str(e)]
+            )
+        except Exception as e:
+            return error_response(
+                message="Failed to initiate order",
+                errors=[str(e)]
+            )
+
+    return await idempotency.run(f"orders.initiate:{user.id}", idempotency_key, order_request, action)
+
+
+@router.post(
+    "/checkout",
+    response_model=ApiResponse[CheckoutResponse],
+    summary="Checkout Cart",
+    description="Create orders for every cart line with a single payment URL",
+    dependencies=[Security(security)]
+)
+async def checkout(
+        checkout_request: CheckoutRequest,
+        user: current_user_dependency,
+        service: order_service_dependency,
+        idempotency: idempotency_service_dependency,
+        idempotency_key: Optional[str] = Header(None, max_length=255, description=IDEMPOTENCY_KEY_DESCRIPTION),
+) -> ApiResponse[CheckoutResponse]:
+    """
+    Checkout a cart in one request:
+
+    - **items**: List of `product_id`/`quantity` lines (1–50)
+
+    All lines and one payment request for the cart total are created in a single transaction.
+
+    Send an `Idempotency-Key` header to make retries safe, duplicates get the first response back.
+    """
+    def action() -> ApiResponse[CheckoutResponse]:
+        try:
+            result = service.checkout(checkout_request, user)
+            return success_response(
+                data=result,
+                message="Checkout initiated successfully"
+            )
+        except ValueError as e:
+            return error_response(
+                message="Invalid checkout data",
+                errors=[str(e)]
+            )
+        except Exception as e:
+            return error_response(
+                message="Failed to checkout",
+                errors=[str(e)]
+            )
+
+    return await idempotency.run(f"orders.checkout:{user.id}", idempotency_key, checkout_request, action)
+
+
+@router.get(
+    "/",
+    response_model=ApiResponse[PaginatedResponse[OrderResponse]],
+    summary="Get My Orders",
+    description="Get paginated list of current user's orders",
+    dependencies=[Security(security)]
+)
+async def get_my_orders(
+        user: current_user_dependency,
+        service: order_service_dependency,
+        product_service: product_service_dependency,
+        page: int = Query(1, ge=1, description="Page number"),
+        size: int = Query(10, ge=1, le=100, description="Items per page"),
+        pagination: Literal["offset", "cursor"] = Query("offset", description="Pagination mode (offset/cursor)"),
+        cursor: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
+        include_total: bool = Query(True, description="Set to false to skip the exact total and rely on has_next")
+) -> ApiResponse[PaginatedResponse[OrderResponse]]:
+    """
+    Get current user's orders with pagination, newest first:
+
+    - **pagination=offset** (default): classic page/size paging
+    - **pagination=cursor**: keyset paging on (created_at, id), follow `next_cursor` until it is null.
+      Passing a `cursor` implies cursor mode and `page` is ignored.
+    - **include_total=false**: `total` and `total_pages` are returned as null
     """
     try:
-        result = service.initiate(order_request, user, product_service)
+        if pagination == "cursor" or cursor:
+            result = service.get_orders_after(user, product_service, cursor, size, include_total)
+        else:
+            result = service.get_orders(user, product_service, page, size, include_total)
         return success_response(
             data=result,
-            message="Order initiated successfully"
+            message=f"Retrieved {len(result.content)} orders"
         )
     except ValueError as e:
         return error_response(
-            message="Invalid order data",
+            message="Invalid pagination parameters",
             errors=[str(e)]
         )
     except Exception as e:
         return error_response(
-            message="Failed to initiate order",
+            message="Failed to retrieve orders",
             errors=[str(e)]
         )
 
 
 @router.get(
-    "/",
-    response_model=ApiResponse[PaginatedResponse[OrderResponse]],
-    summary="Get My Orders",
-    description="Get paginated list of current user's orders",
+    "/summary",
+    response_model=ApiResponse[OrderSummaryResponse],
+    summary="Get My Order Summary",
+    description="Total orders, total spent and order counts per status for the current user",
     dependencies=[Security(security)]
 )
-async def get_my_orders(
+async def get_summary(
         user: current_user_dependency,
-        service: order_service_dependency,
-        product_service: product_service_dependency,
-        page: int = Query(1, ge=1, description="Page number"),
-        size: int = Query(10, ge=1, le=100, description="Items per page")
-) -> ApiResponse[PaginatedResponse[OrderResponse]]:
+        service: order_service_dependency
+) -> ApiResponse[OrderSummaryResponse]:
     """
-    Get current user's orders with pagination
+    Get the current user's order summary:
+
+    - **total_spent**: Sum of successfully paid orders
+    - **initiated_orders / successful_orders / failed_orders / expired_orders**: Order counts per status
     """
     try:
-        result = service.get_orders(user, product_service, page, size)
+        result = service.get_summary(user)
         return success_response(
             data=result,
-            message=f"Retrieved {len(result.content)} orders"
+            message="Order summary retrieved successfully"
         )
     except Exception as e:
         return error_response(
-            message="Failed to retrieve orders",
+            message="Failed to retrieve order summary",
             errors=[str(e)]
         )
 
 
+def _export_response(service: OrderService, user_id: Optional[int], export_format: str) -> StreamingResponse:
+    return StreamingResponse(
+        service.export_orders(user_id, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename=orders.{export_format}"}
+    )
+
+
+@router.get(
+    "/export",
+    summary="Export My Orders",
+    description="Stream all of the current user's orders as NDJSON or CSV",
+    dependencies=[Security(security)]
+)
+async def export_my_orders(
+        user: current_user_dependency,
+        service: order_service_dependency,
+        format: Literal["ndjson", "csv"] = Query("ndjson", description="Export format (ndjson/csv)")
+):
+    """
+    Export the current user's complete order history as a streamed download
+    """
+    return _export_response(service, user.id, format)
+
+
+@router.get(
+    "/export/all",
+    summary="Export All Orders",
+    description="Stream every order in the shop as NDJSON or CSV (admin only)",
+    dependencies=[Security(security)]
+)
+async def export_all_orders(
+        user: current_user_dependency,
+        service: order_service_dependency,
+        format: Literal["ndjson", "csv"] = Query("ndjson", description="Export format (ndjson/csv)")
+):
+    """
+    Export every user's orders as a streamed download
+
+    **Admin role required**
+    """
+    if user.role != "Admin":
+        return error_response(
+            message="Access forbidden",
+            errors=["Admin role required to export all orders"]
+        )
+    return _export_response(service, None, format)
+
+
 @router.get("/{order_id}",
             response_model=ApiResponse[OrderResponse],
             summary="Get My Orders",
@@ -1,13 +1,34 @@
-from typing import Annotated
+import asyncio
+import json
+from typing import Annotated, Literal, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer
 
-from dependencies import get_payment_service, get_order_service
-from schemas.orders_schemas import PaymentCallback, ProcessPayment
+from config.setting import settings
+from dependencies import (
+    get_payment_service,
+    get_order_service,
+    get_idempotency_service,
+    get_payment_gateway,
+    get_payment_queue,
+    verify_payment_callback_signature
+)
+from schemas.orders_schemas import (
+    PaymentCallback,
+    PaymentCallbackBatch,
+    PaymentCallbackBatchResponse,
+    PaymentJobResponse,
+    ProcessPayment
+)
 from schemas.api_response_schemas import ApiResponse, success_response, error_response
+from services.idempotency_service import IdempotencyService
 from services.order_service import OrderService
+from services.payment_gateway import PaymentGateway
+from services.payment_queue_service import PaymentQueue, PaymentQueueFull
 from services.payment_service import PaymentService
+from utils.payment_events import FINAL_PAYMENT_STATUSES, payment_events
 
 router = APIRouter(
     prefix="/payment",
@@ -16,6 +37,9 @@ router = APIRouter(
 
 payment_service_dependency = Annotated[PaymentService, Depends(get_payment_service)]
 order_service_dependency = Annotated[OrderService, Depends(get_order_service)]
+idempotency_service_dependency = Annotated[IdempotencyService, Depends(get_idempotency_service)]
+payment_queue_dependency = Annotated[PaymentQueue, Depends(get_payment_queue)]
+payment_gateway_dependency = Annotated[PaymentGateway, Depends(get_payment_gateway)]
 security = HTTPBearer()
 
 @router.get(
@@ -60,6 +84,84 @@ async def get_payment(
         )
 
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get(
+    "/{payment_id}/events",
+    response_model=ApiResponse[dict],
+    summary="Payment Status Events",
+    description="Stream payment status changes as server-sent events, or long-poll for the next change"
+)
+async def get_payment_events(
+        payment_id: int,
+        request: Request,
+        payment_service: payment_service_dependency,
+        mode: Literal["sse", "longpoll"] = Query("sse", description="sse: event stream, longpoll: one JSON response"),
+        since: str = Query("NEW", description="Long-poll only: the status the client already knows"),
+        timeout: int = Query(settings.PAYMENT_EVENTS_TIMEOUT_SECONDS, ge=1, le=120,
+                             description="Seconds to wait for a change before giving up"),
+):
+    """
+    Wait for payment status changes instead of polling:
+
+    - **mode=sse**: `text/event-stream` that sends the current status, then every change,
+      and closes once the payment is CAPTURED, FAILED or EXPIRED (or after `timeout`)
+    - **mode=longpoll**: returns as soon as the status differs from `since`,
+      or the unchanged status after `timeout`
+    """
+    queue = payment_events.subscribe(payment_id)
+    try:
+        # Subscribed before reading, so a change committed in between is not missed
+        current = payment_service.get_payment_event(payment_id)
+        # Release the connection, waiting for events does not need the database
+        payment_service.db.close()
+    except Exception as e:
+        payment_events.unsubscribe(payment_id, queue)
+        return error_response(
+            message="Payment not found",
+            errors=[str(e)]
+        )
+
+    if mode == "longpoll":
+        try:
+            if current["status"] == since:
+                try:
+                    current = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    return success_response(data=current, message="Payment status unchanged")
+            return success_response(data=current, message=f"Payment is {current['status']}")
+        finally:
+            payment_events.unsubscribe(payment_id, queue)
+
+    async def stream():
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            event = current
+            yield _sse("status", event)
+            while event["status"] not in FINAL_PAYMENT_STATUSES:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    yield _sse("timeout", event)
+                    return
+                try:
+                    event = await asyncio.wait_for(queue.get(), min(settings.PAYMENT_EVENTS_HEARTBEAT_SECONDS,
+                                                                    remaining))
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse("status", event)
+        finally:
+            payment_events.unsubscribe(payment_id, queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @router.post(
     "/process",
     response_model=ApiResponse[PaymentCallback],
@@ -69,7 +171,13 @@ async def get_payment(
 async def process_payment(
         process_payment_request: ProcessPayment,
         payment_service: payment_service_dependency,
-        order_service: order_service_dependency
+        order_service: order_service_dependency,
+        gateway: payment_gateway_dependency,
+        idempotency: idempotency_service_dependency,
+        idempotency_key: Optional[str] = Header(
+            None, max_length=255,
+            description="Unique key per payment attempt, retries with the same key are not charged twice"
+        ),
 ) -> ApiResponse[PaymentCallback]:
     """
     Process payment with card details:
@@ -80,28 +188,139 @@ async def process_payment(
     - **expiry_date**: Card expiry date (MM/YY format)
 
     Returns payment callback with transaction details.
+    Send an `Idempotency-Key` header to make retries safe, duplicates get the first response back.
+    """
+    async def action() -> ApiResponse[PaymentCallback]:
+        try:
+            callback = await payment_service.process_payment(process_payment_request, order_service, gateway)
+
+            if callback.status == "CAPTURED":
+                return success_response(
+                    data=callback,
+                    message="Payment processed successfully"
+                )
+            else:
+                return success_response(
+                    data=callback,
+                    message="Payment failed - transaction declined"
+                )
+
+        except ValueError as e:
+            return error_response(
+                message="Invalid payment data",
+                errors=[str(e)]
+            )
+        except Exception as e:
+            return error_response(
+                message="Payment processing failed",
+                errors=[str(e)]
+            )
+
+    return await idempotency.run("payment.process", idempotency_key, process_payment_request, action)
+
+
+@router.post(
+    "/callbacks/batch",
+    response_model=ApiResponse[PaymentCallbackBatchResponse],
+    summary="Apply Payment Callbacks",
+    description="Apply a batch of gateway settlement callbacks in one transaction",
+    dependencies=[Depends(verify_payment_callback_signature)]
+)
+async def apply_payment_callbacks(
+        batch: PaymentCallbackBatch,
+        order_service: order_service_dependency
+) -> ApiResponse[PaymentCallbackBatchResponse]:
+    """
+    Apply up to 1000 settlement callbacks at once:
+
+    - **callbacks**: List of `reference_id`/`payment_id`/`trx_number`/`status` callbacks
+
+    Each callback gets a result: APPLIED, ALREADY_SETTLED, NOT_FOUND or DUPLICATE.
+    Either every callback is applied or, on failure, none is.
+    The body must be signed: `X-Signature: sha256=<HMAC-SHA256 of the raw body with PAYMENT_CALLBACK_SECRET>`.
     """
     try:
-        callback = payment_service.process_payment(process_payment_request, order_service)
+        result = order_service.apply_payment_callbacks(batch)
+        return success_response(
+            data=result,
+            message=f"Applied {result.applied} of {len(result.results)} callbacks"
+        )
+    except Exception as e:
+        return error_response(
+            message="Failed to apply payment callbacks",
+            errors=[str(e)]
+        )
+
+
+@router.post(
+    "/process/async",
+    response_model=ApiResponse[PaymentJobResponse],
+    status_code=202,
+    summary="Process Payment Asynchronously",
+    description="Queue a payment for processing and poll its job for the result"
+)
+async def process_payment_async(
+        process_payment_request: ProcessPayment,
+        payment_queue: payment_queue_dependency,
+        idempotency: idempotency_service_dependency,
+        response: Response,
+        idempotency_key: Optional[str] = Header(
+            None, max_length=255,
+            description="Unique key per payment attempt, retries with the same key are not queued twice"
+        ),
+) -> ApiResponse[PaymentJobResponse]:
+    """
+    Queue a payment and return immediately with 202 and a job:
 
-        if callback.status == "CAPTURED":
+    - Poll **GET /payment/jobs/{job_id}** until its status is COMPLETED or FAILED
+    - Answers 503 with `Retry-After` when the queue is full
+    """
+    def action() -> ApiResponse[PaymentJobResponse]:
+        try:
+            job = payment_queue.submit(process_payment_request)
             return success_response(
-                data=callback,
-                message="Payment processed successfully"
+                data=job,
+                message="Payment queued for processing"
             )
-        else:
-            return success_response(
-                data=callback,
-                message="Payment failed - transaction declined"
+        except PaymentQueueFull as e:
+            response.status_code = 503
+            response.headers["Retry-After"] = "1"
+            return error_response(
+                message="Payment queue is full",
+                errors=[str(e)]
+            )
+        except Exception as e:
+            response.status_code = 500
+            return error_response(
+                message="Failed to queue payment",
+                errors=[str(e)]
             )
 
+    return await idempotency.run("payment.process_async", idempotency_key, process_payment_request, action,
+                                 replay_status_code=202)
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=ApiResponse[PaymentJobResponse],
+    summary="Get Payment Job",
+    description="Poll the status of a queued payment"
+)
+async def get_payment_job(
+        job_id: str,
+        payment_queue: payment_queue_dependency
+) -> ApiResponse[PaymentJobResponse]:
+    """
+    Get a payment job by ID, `result` holds the payment callback once COMPLETED
+    """
+    try:
+        job = payment_queue.get_job(job_id)
+        return success_response(
+            data=job,
+            message=f"Payment job is {job.status}"
+        )
     except ValueError as e:
         return error_response(
-            message="Invalid payment data",
+            message="Payment job not found",
             errors=[str(e)]
         )
-    except Exception as e:
-        return error_response(
-            message="Payment processing failed",
-            errors=[str(e)]
-        )
\ No newline at end of file
@@ -1,12 +1,22 @@
-from typing import Annotated, Optional
+from typing import Annotated, Literal, Optional
 
-from fastapi import APIRouter, Depends, Query, Security
+from fastapi import APIRouter, Depends, Query, Request, Security
 from fastapi.security import HTTPBearer
 
+from config.setting import settings
 from dependencies import get_product_service
 from schemas.api_response_schemas import ApiResponse, PaginatedResponse, success_response, error_response
-from schemas.products_schemas import ProductResponse
+from schemas.products_schemas import ProductResponse, ProductBatchResponse, ProductFacetsResponse
+from services.catalog_version_service import catalog_version_tracker
 from services.products_service import ProductService
+from utils.catalog_cache import catalog_cache
+from utils.http_cache import (
+    catalog_etag,
+    is_not_modified,
+    not_modified_response,
+    cached_json_response,
+    cache_json_response
+)
 
 router = APIRouter(
     prefix="/products",
@@ -14,6 +24,130 @@ router = APIRouter(
 )
 
 product_service_dependency = Annotated[ProductService, Depends(get_product_service)]
+security = HTTPBearer()
+
+
+@router.get(
+    "/search",
+    response_model=ApiResponse[PaginatedResponse[ProductResponse]],
+    summary="Search Products",
+    description="Full-text search over product titles and descriptions",
+    dependencies=[Security(security)]
+)
+async def search_products(
+        service: product_service_dependency,
+        q: str = Query(..., min_length=1, description="Search terms"),
+        page: int = Query(1, ge=1, description="Page number (starts from 1)"),
+        size: int = Query(10, ge=1, le=100, description="Number of products per page (1-100)"),
+        location: Optional[str] = Query(None, description="Location of Item (JO/SA)"),
+) -> ApiResponse[PaginatedResponse[ProductResponse]]:
+    """
+    Search products by title and description:
+
+    - **q**: Search terms, results are ranked by relevance (title matches weigh more)
+    - **location**: Optional location filter (JO/SA)
+    """
+    try:
+        # Picks up imports made by other processes, which mark the search index stale
+        catalog_version_tracker.current()
+        products = service.search_products(q, page, size, location)
+        return success_response(
+            data=products,
+            message=f"Found {products.total} products"
+        )
+    except ValueError as e:
+        return error_response(
+            message="Invalid search query",
+            errors=[str(e)]
+        )
+    except Exception as e:
+        return error_response(
+            message="Failed to search products",
+            errors=[str(e)]
+        )
+
+
+@router.get(
+    "/batch",
+    response_model=ApiResponse[ProductBatchResponse],
+    summary="Get Products by IDs",
+    description="Retrieve several products in one request",
+    dependencies=[Security(security)]
+)
+async def get_products_batch(
+        service: product_service_dependency,
+        ids: str = Query(..., description="Comma separated product IDs, e.g. 1,2,3"),
+) -> ApiResponse[ProductBatchResponse]:
+    """
+    Get several products by ID:
+
+    - **ids**: Comma separated product IDs (up to PRODUCT_BATCH_MAX_IDS)
+
+    Returns found products in request order and lists unknown IDs in `missing_ids`.
+    """
+    try:
+        try:
+            product_ids = [int(product_id) for product_id in ids.split(",") if product_id.strip()]
+        except ValueError:
+            raise ValueError("ids must be a comma separated list of integers")
+        if not product_ids:
+            raise ValueError("At least one product ID is required")
+        if len(product_ids) > settings.PRODUCT_BATCH_MAX_IDS:
+            raise ValueError(f"At most {settings.PRODUCT_BATCH_MAX_IDS} product IDs can be requested at once")
+
+        catalog_version_tracker.current()
+        result = service.get_products_by_ids(product_ids)
+        return success_response(
+            data=result,
+            message=f"Retrieved {len(result.content)} products"
+        )
+    except ValueError as e:
+        return error_response(
+            message="Invalid product IDs",
+            errors=[str(e)]
+        )
+    except Exception as e:
+        return error_response(
+            message="Failed to retrieve products",
+            errors=[str(e)]
+        )
+
+
+@router.get(
+    "/facets",
+    response_model=ApiResponse[ProductFacetsResponse],
+    summary="Get Catalog Facets",
+    description="Per-location counts, price stats and price histograms",
+    dependencies=[Security(security)]
+)
+async def get_facets(
+        service: product_service_dependency,
+        request: Request
+) -> ApiResponse[ProductFacetsResponse]:
+    """
+    Get catalog facets:
+
+    Returns product counts and min/max/avg price per location (JO/SA),
+    plus price histograms with PRODUCT_FACET_PRICE_BUCKET_SIZE wide buckets.
+    """
+    catalog_version = catalog_version_tracker.current()
+    etag = catalog_etag(request, catalog_version)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    cached = cached_json_response(etag, catalog_version)
+    if cached is not None:
+        return cached
+
+    try:
+        version = catalog_cache.version
+        facets = service.get_facets()
+        return cache_json_response(etag, facets, "Facets retrieved successfully", version, catalog_version)
+    except Exception as e:
+        return error_response(
+            message="Failed to retrieve facets",
+            errors=[str(e)]
+        )
 
 
 @router.get(
@@ -24,7 +158,8 @@ product_service_dependency = Annotated[ProductService, Depends(get_product_servi
 )
 async def get_product(
         product_id: int,
-        service: product_service_dependency
+        service: product_service_dependency,
+        request: Request
 ) -> ApiResponse[ProductResponse]:
     """
     Get a specific product by ID:
@@ -32,13 +167,23 @@ async def get_product(
     - **product_id**: The ID of the product to retrieve
 
     Returns product information including title, description, price, and location.
+    Supports conditional requests with `If-None-Match`, `*` matches only existing products.
     """
+    catalog_version = catalog_version_tracker.current()
+    etag = catalog_etag(request, catalog_version)
+    if is_not_modified(request, etag, exists=False):
+        return not_modified_response(etag)
+
+    cached = cached_json_response(etag, catalog_version)
+    if cached is not None:
+        return not_modified_response(etag) if is_not_modified(request, etag) else cached
+
     try:
+        version = catalog_cache.version
         product = service.get_product_by_id(product_id)
-        return success_response(
-            data=product,
-            message="Product retrieved successfully"
-        )
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        return cache_json_response(etag, product, "Product retrieved successfully", version, catalog_version)
     except ValueError as e:
         return error_response(
             message="Product not found",
@@ -50,7 +195,6 @@ async def get_product(
             errors=[str(e)]
         )
 
-security = HTTPBearer()
 @router.get(
     "/",
     response_model=ApiResponse[PaginatedResponse[ProductResponse]],
@@ -60,15 +204,45 @@ security = HTTPBearer()
 )
 async def get_products(
         service: product_service_dependency,
+        request: Request,
         page: int = Query(1, ge=1, description="Page number (starts from 1)"),
         size: int = Query(10, ge=1, le=100, description="Number of products per page (1-100)"),
         location: Optional[str] = Query(None, description="Location of Item (JO/SA") ,
+        pagination: Literal["offset", "cursor"] = Query("offset", description="Pagination mode (offset/cursor)"),
+        cursor: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
+        include_total: bool = Query(True, description="Set to false to skip the exact total and rely on has_next"),
 ) -> ApiResponse[PaginatedResponse[ProductResponse]]:
+    """
+    Get paginated list of products:
+
+    - **pagination=offset** (default): classic page/size paging
+    - **pagination=cursor**: keyset paging, follow `next_cursor` until it is null.
+      Passing a `cursor` implies cursor mode and `page` is ignored.
+    - **include_total=false**: `total` and `total_pages` are returned as null
+
+    Supports conditional requests with `If-None-Match`.
+    """
+    catalog_version = catalog_version_tracker.current()
+    etag = catalog_etag(request, catalog_version)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    cached = cached_json_response(etag, catalog_version)
+    if cached is not None:
+        return cached
+
     try:
-        products = service.get_products(page, size, location)
-        return success_response(
-            data=products,
-            message=f"Retrieved {len(products.content)} products"
+        version = catalog_cache.version
+        if pagination == "cursor" or cursor:
+            products = service.get_products_after(cursor, size, location, include_total)
+        else:
+            products = service.get_products(page, size, location, include_total)
+        return cache_json_response(etag, products, f"Retrieved {len(products.content)} products", version,
+                                   catalog_version)
+    except ValueError as e:
+        return error_response(
+            message="Invalid pagination parameters",
+            errors=[str(e)]
         )
     except Exception as e:
         return error_response(
@@ -1,3 +1,4 @@
+import json
 from datetime import datetime
 
 # schemas/pagination.py
@@ -12,12 +13,13 @@ class   PaginatedResponse(BaseModel, Generic[T]):
     Generic paginated response that can be used with any data type
     """
     content: List[T] = Field(..., description="List of items")
-    total: int = Field(..., description="Total number of items", example=25)
+    total: Optional[int] = Field(..., description="Total number of items (null when the total was skipped)", example=25)
     page: int = Field(..., description="Current page number", example=1)
     size: int = Field(..., description="Number of items per page", example=10)
-    total_pages: int = Field(..., description="Total number of pages", example=3)
+    total_pages: Optional[int] = Field(..., description="Total number of pages (null when the total was skipped)", example=3)
     has_next: bool = Field(..., description="Whether there is a next page", example=True)
     has_previous: bool = Field(..., description="Whether there is a previous page", example=False)
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor for the next page (cursor pagination only)")
 
     class Config:
         schema_extra = {
@@ -28,7 +30,8 @@ class   PaginatedResponse(BaseModel, Generic[T]):
                 "size": 10,
                 "total_pages": 3,
                 "has_next": True,
-                "has_previous": False
+                "has_previous": False,
+                "next_cursor": None
             }
         }
 
@@ -75,6 +78,18 @@ def error_response(message: str, errors: List[str] = None) -> ApiResponse[None]:
         errors=errors or []
     )
 
+def encode_success_response(data_json: bytes, message: str = "Success") -> bytes:
+    """
+    Build the JSON bytes of a successful ApiResponse around already serialized data,
+    with a fresh timestamp
+    """
+    return b"".join([
+        b'{"data":', data_json,
+        b',"timestamp":', json.dumps(datetime.utcnow().isoformat()).encode("utf-8"),
+        b',"status":"success","message":', json.dumps(message).encode("utf-8"),
+        b',"errors":[]}'
+    ])
+
 def validation_error_response(errors: List[str]) -> ApiResponse[None]:
     """Create a validation error response"""
     return ApiResponse(
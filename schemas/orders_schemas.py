@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List, Optional
 
 from pydantic import BaseModel, Field, conint
 
@@ -9,6 +10,10 @@ class CreateOrderRequest(BaseModel):
     product_id: conint(strict=True, gt=0) = Field(..., description="ID of the product to order (must be > 0)")
     quantity: conint(strict=True, gt=0, le=100) = Field(..., description="Quantity of the product (1–100)")
 
+class CheckoutRequest(BaseModel):
+    items: List[CreateOrderRequest] = Field(..., min_length=1, max_length=50,
+                                            description="Cart lines to order (1–50)")
+
 class OrderResponse(BaseModel):
     order_id: int
     trx_id: str
@@ -22,6 +27,19 @@ class OrderResponse(BaseModel):
 class InitiateOrderResponse(BaseModel):
     payment_url: str
 
+class CheckoutResponse(InitiateOrderResponse):
+    order_ids: List[int]
+    total_price: float
+
+class OrderSummaryResponse(BaseModel):
+    total_orders: int
+    total_spent: float
+    initiated_orders: int
+    successful_orders: int
+    failed_orders: int
+    expired_orders: int = 0
+    updated_at: Optional[datetime] = None
+
 class ProcessPayment(BaseModel):
     payment_id: int
     card_number: str
@@ -33,3 +51,33 @@ class PaymentCallback(BaseModel):
     reference_id: int
     trx_number: str
     status: str
+    payment_id: Optional[int] = None
+
+
+class PaymentCallbackBatch(BaseModel):
+    callbacks: List[PaymentCallback] = Field(..., min_length=1, max_length=1000,
+                                             description="Settlement callbacks to apply (1–1000)")
+
+class PaymentCallbackResult(BaseModel):
+    reference_id: int
+    payment_id: Optional[int] = None
+    trx_number: str
+    # APPLIED, ALREADY_SETTLED, NOT_FOUND or DUPLICATE (same payment earlier in the batch)
+    result: str
+    orders_settled: int = 0
+
+class PaymentCallbackBatchResponse(BaseModel):
+    results: List[PaymentCallbackResult]
+    applied: int
+    skipped: int
+
+
+class PaymentJobResponse(BaseModel):
+    job_id: str
+    payment_id: int
+    # QUEUED -> PROCESSING -> COMPLETED/FAILED
+    status: str
+    result: Optional[PaymentCallback] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic import BaseModel, Field
 
 
@@ -27,4 +29,62 @@ class ProductResponse(BaseModel):
                 "price": 150.00,
                 "location": "JO"
             }
-        }
\ No newline at end of file
+        }
+
+class ProductBatchResponse(BaseModel):
+    """
+    Products resolved by a batch lookup, in request order
+    """
+    content: List[ProductResponse] = Field(..., description="Found products in the order they were requested")
+    missing_ids: List[int] = Field(default_factory=list, description="Requested IDs that do not exist")
+
+
+class PriceBucket(BaseModel):
+    """
+    Histogram bucket covering prices in [min_price, max_price)
+    """
+    min_price: float = Field(..., description="Inclusive lower bound", example=100.0)
+    max_price: float = Field(..., description="Exclusive upper bound", example=150.0)
+    count: int = Field(..., description="Products in the bucket", example=12)
+
+
+class LocationFacet(BaseModel):
+    """
+    Aggregates for one location
+    """
+    location: Optional[str] = Field(..., description="Product location", example="JO")
+    count: int = Field(..., description="Number of products", example=50)
+    min_price: Optional[float] = Field(None, description="Lowest price", example=20.0)
+    max_price: Optional[float] = Field(None, description="Highest price", example=300.0)
+    avg_price: Optional[float] = Field(None, description="Average price", example=132.5)
+    price_buckets: List[PriceBucket] = Field(default_factory=list, description="Price histogram")
+
+
+class ProductFacetsResponse(BaseModel):
+    """
+    Catalog-wide facets and aggregate stats
+    """
+    total: int = Field(..., description="Number of products", example=100)
+    min_price: Optional[float] = Field(None, description="Lowest price", example=20.0)
+    max_price: Optional[float] = Field(None, description="Highest price", example=300.0)
+    avg_price: Optional[float] = Field(None, description="Average price", example=132.5)
+    bucket_size: float = Field(..., description="Width of each price bucket", example=50.0)
+    locations: List[LocationFacet] = Field(default_factory=list, description="Per-location aggregates")
+    price_buckets: List[PriceBucket] = Field(default_factory=list, description="Catalog-wide price histogram")
+
+
+class CatalogImportReport(BaseModel):
+    """
+    Summary of a catalog CSV import run
+    """
+    source: str = Field(..., description="Imported file path", example="items.csv")
+    content_hash: str = Field(..., description="SHA-256 of the file contents")
+    skipped_unchanged: bool = Field(False, description="True when the file was already imported and nothing ran")
+    batches: int = Field(0, description="Number of batches applied")
+    rows_read: int = Field(0, description="Valid rows read from the file")
+    rows_inserted: int = Field(0, description="New products inserted")
+    rows_updated: int = Field(0, description="Existing products whose data changed")
+    rows_unchanged: int = Field(0, description="Rows identical to the stored product")
+    rows_skipped: int = Field(0, description="Malformed rows that were skipped")
+    elapsed_seconds: float = Field(0, description="Wall clock duration of the import")
+    rows_per_second: float = Field(0, description="Import throughput")
@@ -0,0 +1,189 @@
+import argparse
+import csv
+import hashlib
+import time
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from config.setting import settings
+from modles.catalog_models import CatalogImport
+from modles.product_models import Product
+from schemas.products_schemas import CatalogImportReport
+from services.catalog_version_service import CatalogVersionService
+from utils.catalog_cache import CatalogCache, catalog_cache
+
+PRODUCT_FIELDS = ("title", "description", "price", "location")
+
+
+def file_content_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks so large catalogs are never fully loaded"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_product_row(row: dict) -> dict:
+    return {
+        "id": int(row["id"]),
+        "title": row["title"].strip(),
+        "description": row["description"].strip(),
+        "price": float(row["price"]),
+        "location": row["location"].strip()
+    }
+
+
+class CatalogImportService:
+    """
+    Streams a product CSV into the database in batches.
+
+    Each batch is compared against the stored rows with one IN query, new
+    products are bulk inserted, changed products are bulk updated and
+    unchanged rows are left alone. Files whose content hash matches the last
+    import of the same source are skipped entirely.
+    """
+
+    def __init__(self, db: Session, batch_size: int = settings.CATALOG_IMPORT_BATCH_SIZE,
+                 cache: CatalogCache = catalog_cache):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.db = db
+        self.batch_size = batch_size
+        self.cache = cache
+
+    def import_csv(self, path: str, force: bool = False) -> CatalogImportReport:
+        """
+        Import or refresh products from a CSV file with id,title,description,price,location columns
+        """
+        content_hash = file_content_hash(path)
+        report = CatalogImportReport(source=path, content_hash=content_hash)
+
+        if not force and self._already_imported(path, content_hash):
+            report.skipped_unchanged = True
+            print(f"Catalog '{path}' unchanged since last import. Skipping.")
+            return report
+
+        started = time.perf_counter()
+        try:
+            for batch in self._read_batches(path, report):
+                batch_started = time.perf_counter()
+                inserted, updated = self._apply_batch(batch)
+                if inserted or updated:
+                    # Committed with the rows so other processes see the change together with the data
+                    CatalogVersionService(self.db).bump()
+                self.db.commit()
+
+                report.batches += 1
+                report.rows_inserted += inserted
+                report.rows_updated += updated
+                report.rows_unchanged += len(batch) - inserted - updated
+
+                batch_elapsed = time.perf_counter() - batch_started
+                rate = len(batch) / batch_elapsed if batch_elapsed > 0 else 0
+                print(f"Catalog import batch {report.batches}: {len(batch)} rows "
+                      f"({inserted} new, {updated} changed) at {rate:.0f} rows/sec")
+
+            report.elapsed_seconds = round(time.perf_counter() - started, 3)
+            if report.elapsed_seconds > 0:
+                report.rows_per_second = round(report.rows_read / report.elapsed_seconds, 1)
+
+            self.db.add(CatalogImport(
+                source=path,
+                content_hash=content_hash,
+                rows_read=report.rows_read,
+                rows_inserted=report.rows_inserted,
+                rows_updated=report.rows_updated,
+                rows_skipped=report.rows_skipped
+            ))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            if report.rows_inserted or report.rows_updated:
+                self.cache.invalidate_all()
+
+        print(f"Catalog import finished: {report.rows_read} rows read, {report.rows_inserted} inserted, "
+              f"{report.rows_updated} updated, {report.rows_skipped} skipped "
+              f"in {report.elapsed_seconds}s ({report.rows_per_second} rows/sec)")
+        return report
+
+    def _already_imported(self, path: str, content_hash: str) -> bool:
+        last_import = (self.db.query(CatalogImport)
+                       .filter(CatalogImport.source == path)
+                       .order_by(CatalogImport.id.desc())
+                       .first())
+        return last_import is not None and last_import.content_hash == content_hash
+
+    def _read_batches(self, path: str, report: CatalogImportReport) -> Iterator[List[dict]]:
+        """Yield parsed rows in batches, de-duplicated by id within a batch (last row wins)"""
+        batch = {}
+        with open(path, "r", encoding="utf-8", newline="") as file:
+            for row in csv.DictReader(file):
+                try:
+                    product = parse_product_row(row)
+                except Exception as e:
+                    print(f" Error processing row {row}: {e}")
+                    report.rows_skipped += 1
+                    continue
+
+                report.rows_read += 1
+                batch[product["id"]] = product
+                if len(batch) >= self.batch_size:
+                    yield list(batch.values())
+                    batch = {}
+
+        if batch:
+            yield list(batch.values())
+
+    def _apply_batch(self, batch: List[dict]) -> Tuple[int, int]:
+        """Insert new rows and update changed ones, returning (inserted, updated)"""
+        ids = [product["id"] for product in batch]
+        existing = {
+            row.id: tuple(getattr(row, field) for field in PRODUCT_FIELDS)
+            for row in self.db.execute(
+                select(Product.id, *(getattr(Product, field) for field in PRODUCT_FIELDS))
+                .where(Product.id.in_(ids))
+            )
+        }
+
+        new_rows = [product for product in batch if product["id"] not in existing]
+        changed_rows = [
+            product for product in batch
+            if product["id"] in existing
+            and existing[product["id"]] != tuple(product[field] for field in PRODUCT_FIELDS)
+        ]
+
+        # Core-level bulk statements keep rows out of the session identity map
+        if new_rows:
+            self.db.execute(insert(Product), new_rows)
+        if changed_rows:
+            self.db.execute(update(Product), changed_rows)
+
+        return len(new_rows), len(changed_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the product catalog from a CSV file")
+    parser.add_argument("path", nargs="?", default=settings.CATALOG_CSV_PATH, help="CSV file to import")
+    parser.add_argument("--batch-size", type=int, default=settings.CATALOG_IMPORT_BATCH_SIZE,
+                        help="Rows per batch")
+    parser.add_argument("--force", action="store_true", help="Re-import even if the file is unchanged")
+    args = parser.parse_args()
+
+    from database import SessionLocal, engine
+    from utils.db_schema import ensure_schema
+    ensure_schema(engine)
+
+    db = SessionLocal()
+    try:
+        CatalogImportService(db, batch_size=args.batch_size).import_csv(args.path, force=args.force)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
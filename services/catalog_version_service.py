@@ -0,0 +1,114 @@
+import secrets
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from config.setting import settings
+from database import ReadSessionLocal
+from modles.catalog_models import CatalogVersion
+from utils.catalog_cache import CatalogCache, catalog_cache
+
+_ROW_ID = 1
+
+
+class CatalogVersionService:
+    """
+    Reads and bumps the catalog version row.
+
+    Product writers call bump() inside the transaction that changes products,
+    so the version commits together with the data it describes and every
+    process, including the CLI importer, sees the same value.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def bump(self) -> None:
+        """Move the catalog to a new version with one atomic UPDATE, creating the row when missing"""
+        values = {
+            "version": CatalogVersion.version + 1,
+            "token": secrets.token_hex(16),
+            "updated_at": datetime.now()
+        }
+        result = self.db.execute(update(CatalogVersion).where(CatalogVersion.id == _ROW_ID).values(**values))
+        if result.rowcount:
+            return
+
+        try:
+            with self.db.begin_nested():
+                self.db.add(CatalogVersion(id=_ROW_ID, version=1, token=values["token"]))
+        except IntegrityError:
+            # Another writer created the row first
+            self.db.execute(update(CatalogVersion).where(CatalogVersion.id == _ROW_ID).values(**values))
+
+    def get_token(self) -> str:
+        """
+        Opaque validator of the current catalog content.
+        The random token changes on every bump, so it never repeats after the database is recreated.
+        """
+        row = self.db.get(CatalogVersion, _ROW_ID)
+        return f"{row.version}.{row.token}" if row else "0"
+
+
+class CatalogVersionTracker:
+    """
+    Per-process view of the shared catalog version, re-read at most every
+    CATALOG_VERSION_CHECK_SECONDS so conditional GETs rarely touch the database.
+
+    When the version moved, for example after an import run from another
+    process, the in-process catalog cache is dropped. The version is read
+    from the replica when one is configured, the same place catalog reads go.
+    """
+
+    def __init__(self, session_factory: sessionmaker, cache: CatalogCache = catalog_cache,
+                 check_seconds: float = settings.CATALOG_VERSION_CHECK_SECONDS):
+        self.session_factory = session_factory
+        self.cache = cache
+        self.check_seconds = check_seconds
+        self._token: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.changes = 0
+
+    def current(self) -> str:
+        with self._lock:
+            if self._token is not None and time.monotonic() - self._checked_at < self.check_seconds:
+                return self._token
+
+            db = self.session_factory()
+            try:
+                token = CatalogVersionService(db).get_token()
+            except Exception as e:
+                if self._token is None:
+                    raise
+                print(f"Catalog version check failed, keeping version {self._token}: {e}")
+                return self._token
+            finally:
+                db.close()
+
+            self.checks += 1
+            self._checked_at = time.monotonic()
+            if token != self._token:
+                # Drop cached reads before any request can pair the new version with old data,
+                # including the first check since reads may have been cached before it
+                self.changes += 1
+                self.cache.invalidate_all()
+            self._token = token
+            return token
+
+    def stats(self) -> dict:
+        return {
+            "token": self._token,
+            "check_seconds": self.check_seconds,
+            "checks": self.checks,
+            "changes": self.changes
+        }
+
+
+catalog_version_tracker = CatalogVersionTracker(ReadSessionLocal)
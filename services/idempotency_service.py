@@ -0,0 +1,144 @@
+import hashlib
+import inspect
+import json
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional, Union
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config.setting import settings
+from modles.idempotency_models import IdempotencyRecord
+from schemas.api_response_schemas import ApiResponse, error_response
+from utils.lru_cache import LRUCache
+
+# Completed responses by (scope, key), so most retries never reach the database
+idempotency_cache = LRUCache(max_size=settings.IDEMPOTENCY_CACHE_MAX_SIZE,
+                             ttl_seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+
+
+async def _resolve(result):
+    return await result if inspect.isawaitable(result) else result
+
+
+def hash_payload(payload: BaseModel) -> str:
+    return hashlib.sha256(
+        json.dumps(payload.model_dump(mode="json"), sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class IdempotencyService:
+    """
+    Honors the Idempotency-Key header of endpoints that create rows.
+
+    The first request with a key claims it with a PENDING record, runs and
+    stores its successful response. Repeats with the same payload get that
+    response back without running again. Failed requests release the key so
+    the client can retry, and keys expire after IDEMPOTENCY_KEY_TTL_SECONDS.
+    """
+
+    def __init__(self, db: Session, cache: LRUCache = idempotency_cache):
+        self.db = db
+        self.cache = cache
+
+    async def run(self, scope: str, key: Optional[str], payload: BaseModel,
+                  action: Callable[[], Union[ApiResponse, Awaitable[ApiResponse]]],
+                  replay_status_code: int = 200) -> Union[ApiResponse, JSONResponse]:
+        """
+        Run action, a plain or async callable, once per (scope, key),
+        replaying the stored response for duplicates
+        """
+        if not key:
+            return await _resolve(action())
+
+        request_hash = hash_payload(payload)
+        try:
+            stored = self.begin(scope, key, request_hash)
+        except ValueError as e:
+            return error_response(
+                message="Idempotency key conflict",
+                errors=[str(e)]
+            )
+        if stored is not None:
+            return JSONResponse(content=stored, status_code=replay_status_code,
+                                headers={"Idempotent-Replayed": "true"})
+
+        try:
+            response = await _resolve(action())
+        except Exception:
+            self.release(scope, key)
+            raise
+
+        if response.status == "success":
+            self.complete(scope, key, request_hash, response)
+        else:
+            self.release(scope, key)
+        return response
+
+    def begin(self, scope: str, key: str, request_hash: str) -> Optional[dict]:
+        """
+        Return the stored response for a completed key, or claim the key and return None.
+        Raises ValueError if the key belongs to a different payload or is still being processed.
+        """
+        cached = self.cache.get((scope, key))
+        if cached is not None:
+            return self._check_hash(cached[0], request_hash) or cached[1]
+
+        record = self.db.scalars(
+            select(IdempotencyRecord).where(IdempotencyRecord.scope == scope, IdempotencyRecord.key == key)
+        ).first()
+        if record is not None:
+            if self._is_expired(record):
+                self.db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.id == record.id))
+            else:
+                self._check_hash(record.request_hash, request_hash)
+                if record.status != "COMPLETED":
+                    raise ValueError("A request with this Idempotency-Key is still being processed")
+                response = json.loads(record.response_body)
+                self.cache.set((scope, key), (record.request_hash, response))
+                return response
+
+        try:
+            self.db.add(IdempotencyRecord(scope=scope, key=key, request_hash=request_hash, status="PENDING"))
+            self.db.commit()
+        except IntegrityError:
+            # A concurrent request claimed the key first
+            self.db.rollback()
+            raise ValueError("A request with this Idempotency-Key is still being processed")
+        return None
+
+    def complete(self, scope: str, key: str, request_hash: str, response: ApiResponse) -> None:
+        body = response.model_dump(mode="json")
+        self.db.execute(
+            update(IdempotencyRecord)
+            .where(IdempotencyRecord.scope == scope, IdempotencyRecord.key == key)
+            .values(status="COMPLETED", response_body=json.dumps(body))
+        )
+        self.db.commit()
+        self.cache.set((scope, key), (request_hash, body))
+
+    def release(self, scope: str, key: str) -> None:
+        """Drop a claimed key, discarding whatever the failed action left in the session"""
+        self.db.rollback()
+        self.db.execute(
+            delete(IdempotencyRecord)
+            .where(IdempotencyRecord.scope == scope, IdempotencyRecord.key == key,
+                   IdempotencyRecord.status == "PENDING")
+        )
+        self.db.commit()
+
+    @staticmethod
+    def _check_hash(stored_hash: str, request_hash: str) -> None:
+        if stored_hash != request_hash:
+            raise ValueError("Idempotency-Key was already used with a different request payload")
+
+    @staticmethod
+    def _is_expired(record: IdempotencyRecord) -> bool:
+        age = datetime.now() - record.created_at
+        if record.status == "COMPLETED":
+            return age > timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+        # A PENDING record this old belongs to a request that died mid-flight
+        return age > timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT_SECONDS)
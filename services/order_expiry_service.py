@@ -0,0 +1,182 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import String, and_, cast, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from config.setting import settings
+from modles.order_models import Order, PaymentRequest
+from services.order_summary_service import OrderSummaryService, merge_deltas, summary_delta
+from utils.payment_events import publish_after_commit
+
+
+class OrderExpiryService:
+    """
+    Expires INITIATED orders, and their NEW payment requests, that were never paid.
+    Works in bounded batches of set-based UPDATEs, one transaction per batch.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def expire_batch(self, cutoff: datetime, batch_size: int) -> tuple:
+        """
+        Expire the NEW payments of up to batch_size orders created before cutoff,
+        then every INITIATED order of those payments. Returns (orders_expired, payments_expired).
+        """
+        # An order's payment: checkout lines link it by payment_id, single orders by reference_id
+        order_payment = or_(PaymentRequest.payment_id == Order.payment_id,
+                            and_(Order.payment_id.is_(None), PaymentRequest.reference_id == cast(Order.id, String)))
+        # Orders whose payment is PROCESSING are being charged right now and are left alone
+        candidate_payment_ids = set(self.db.scalars(
+            select(PaymentRequest.payment_id)
+            .join(Order, order_payment)
+            .where(Order.status == "INITIATED", Order.created_at < cutoff, PaymentRequest.status == "NEW")
+            .order_by(Order.created_at)
+            .limit(batch_size)
+        ))
+        if not candidate_payment_ids:
+            return 0, 0
+
+        try:
+            # Payments are locked before their orders, the same order payment settlement uses
+            expired_payments = self.db.execute(
+                update(PaymentRequest)
+                .where(PaymentRequest.payment_id.in_(candidate_payment_ids), PaymentRequest.status == "NEW")
+                .values(status="EXPIRED")
+                .returning(PaymentRequest.payment_id, PaymentRequest.reference_id)
+            ).all()
+            if not expired_payments:
+                self.db.rollback()
+                return 0, 0
+
+            # Every order of an expired payment, including checkout lines beyond this batch
+            payment_ids = [row.payment_id for row in expired_payments]
+            reference_ids = [int(row.reference_id) for row in expired_payments]
+            expired = self.db.execute(
+                update(Order)
+                .where(Order.status == "INITIATED",
+                       or_(Order.payment_id.in_(payment_ids),
+                           and_(Order.payment_id.is_(None), Order.id.in_(reference_ids))))
+                .values(status="EXPIRED")
+                .returning(Order.id, Order.user_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            for payment_id in payment_ids:
+                publish_after_commit(self.db, payment_id, "EXPIRED")
+
+            deltas = {}
+            for row in expired:
+                merge_deltas(deltas.setdefault(row.user_id, {}), summary_delta("INITIATED", "EXPIRED"))
+            summaries = OrderSummaryService(self.db)
+            for user_id, delta in deltas.items():
+                summaries.apply_delta(user_id, delta)
+
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        return len(expired), len(expired_payments)
+
+    def expire_stale_orders(self, ttl_seconds: int = settings.ORDER_EXPIRY_TTL_SECONDS,
+                            batch_size: int = settings.ORDER_SWEEPER_BATCH_SIZE) -> tuple:
+        """Expire every order older than ttl_seconds, batch by batch. Returns (orders, payments)."""
+        cutoff = datetime.now() - timedelta(seconds=ttl_seconds)
+        orders_expired = payments_expired = 0
+        while True:
+            orders, payments = self.expire_batch(cutoff, batch_size)
+            orders_expired += orders
+            payments_expired += payments
+            if orders < batch_size:
+                return orders_expired, payments_expired
+
+
+class OrderSweeper:
+    """
+    Background task started from the application lifespan that periodically
+    runs OrderExpiryService in a worker thread and keeps per-run metrics.
+    """
+
+    def __init__(self, session_factory: sessionmaker,
+                 interval_seconds: float = settings.ORDER_SWEEPER_INTERVAL_SECONDS,
+                 ttl_seconds: int = settings.ORDER_EXPIRY_TTL_SECONDS,
+                 batch_size: int = settings.ORDER_SWEEPER_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.ttl_seconds = ttl_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.failures = 0
+        self.total_orders_expired = 0
+        self.total_payments_expired = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_orders_expired = 0
+        self.last_payments_expired = 0
+        self.last_duration_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    def sweep_once(self) -> tuple:
+        """Run one sweep with its own session and record its metrics"""
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            orders, payments = OrderExpiryService(db).expire_stale_orders(self.ttl_seconds, self.batch_size)
+            self.last_error = None
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"Order sweeper failed: {e}")
+            orders, payments = 0, 0
+        finally:
+            db.close()
+
+        self.runs += 1
+        self.last_run_at = datetime.now()
+        self.last_orders_expired = orders
+        self.last_payments_expired = payments
+        self.total_orders_expired += orders
+        self.total_payments_expired += payments
+        self.last_duration_seconds = round(time.perf_counter() - started, 3)
+        if orders or payments:
+            print(f"Order sweeper expired {orders} orders and {payments} payments "
+                  f"in {self.last_duration_seconds}s")
+        return orders, payments
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.to_thread(self.sweep_once)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval_seconds,
+            "ttl_seconds": self.ttl_seconds,
+            "batch_size": self.batch_size,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_orders_expired": self.last_orders_expired,
+            "last_payments_expired": self.last_payments_expired,
+            "last_duration_seconds": self.last_duration_seconds,
+            "last_error": self.last_error,
+            "total_orders_expired": self.total_orders_expired,
+            "total_payments_expired": self.total_payments_expired
+        }
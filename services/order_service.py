@@ -1,97 +1,340 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from sqlalchemy import case, func, insert, or_, select, tuple_, update
 from sqlalchemy.orm import Session
 
 from modles.order_models import Order, PaymentRequest
+from modles.product_models import Product
 from modles.users_models import User
-from schemas.orders_schemas import CreateOrderRequest, InitiateOrderResponse, OrderResponse
+from schemas.orders_schemas import (
+    CreateOrderRequest,
+    CheckoutRequest,
+    CheckoutResponse,
+    InitiateOrderResponse,
+    OrderResponse,
+    OrderSummaryResponse,
+    PaymentCallbackBatch,
+    PaymentCallbackBatchResponse,
+    PaymentCallbackResult
+)
 from schemas.api_response_schemas import PaginatedResponse
+from schemas.products_schemas import ProductResponse
+from services.order_summary_service import OrderSummaryService, merge_deltas, summary_delta
 from services.products_service import ProductService
 from config.setting import settings
+from utils.pagination import encode_cursor, decode_cursor
+from utils.payment_events import publish_after_commit
+
+EXPORT_COLUMNS = ("order_id", "user_id", "product_id", "product_title", "product_location", "unit_price",
+                  "quantity", "price", "status", "trx_number", "created_at")
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
 
 def calculate_price(order_price: float, quantity: int) -> float:
     return order_price * quantity
 
 
 class OrderService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, read_db: Session = None):
         self.db = db
+        # Order history and exports may read from a replica
+        self.read_db = read_db if read_db is not None else db
 
     @classmethod
     def mock_payment_callback(cls, callback, db: Session):
-        order = db.query(Order).get(callback.reference_id)
-        if callback.status == "CAPTURED":
-            order.status = "SUCCESS"
-        else:
-            order.status = "FAILED"
-        order.trx_number = callback.trx_number
-        db.add(order)
-        db.commit()
-        db.refresh(order)
-
-    def initiate(self, order_request: CreateOrderRequest, user: User,
-                 product_service: ProductService) -> InitiateOrderResponse:
-        db_product = product_service.get_product_by_id(order_request.product_id)
-        price = calculate_price(db_product.price, order_request.quantity)
-        new_order = Order(
-            user_id=user.id,
-            product_id=order_request.product_id,
-            quantity=order_request.quantity,
-            price=price,
-            status='INITIATED'
+        try:
+            cls.apply_payment_result(callback, db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    def apply_payment_callbacks(self, batch: PaymentCallbackBatch) -> PaymentCallbackBatchResponse:
+        """
+        Apply a burst of settlement callbacks in one transaction
+        """
+        try:
+            results = self.apply_payment_results(batch.callbacks, self.db)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        applied = sum(1 for result in results if result.result == "APPLIED")
+        return PaymentCallbackBatchResponse(results=results, applied=applied, skipped=len(results) - applied)
+
+    @classmethod
+    def apply_payment_result(cls, callback, db: Session) -> int:
+        """
+        Settle the orders of a payment without committing, so it can share the payment's transaction.
+        Only INITIATED orders move to SUCCESS/FAILED, a repeated or late callback changes nothing.
+        Returns the number of orders settled.
+        """
+        return cls.apply_payment_results([callback], db)[0].orders_settled
+
+    @staticmethod
+    def apply_payment_results(callbacks: list, db: Session) -> List[PaymentCallbackResult]:
+        """
+        Apply payment callbacks with set-based updates, without committing.
+
+        Unsettled (NEW or PROCESSING) payments and INITIATED orders are updated with one conditional UPDATE
+        each, CASE expressions pick every row's status and trx_number from its callback.
+        Checkout lines are matched by payment_id, single orders by reference_id. A callback carrying only
+        the reference_id of a checkout settles every line through the payment id its payment update returns.
+        Returns one result per callback, in order.
+        """
+        # (payment status, order status, trx_number, result) per payment_id and per reference_id
+        by_payment, by_reference, results = {}, {}, []
+        for callback in callbacks:
+            result = PaymentCallbackResult(reference_id=callback.reference_id, payment_id=callback.payment_id,
+                                           trx_number=callback.trx_number, result="APPLIED")
+            results.append(result)
+            if callback.reference_id in by_reference or callback.payment_id in by_payment:
+                result.result = "DUPLICATE"
+                continue
+
+            captured = callback.status == "CAPTURED"
+            item = ("CAPTURED" if captured else "FAILED", "SUCCESS" if captured else "FAILED",
+                    callback.trx_number, result)
+            by_reference[callback.reference_id] = item
+            if callback.payment_id is not None:
+                by_payment[callback.payment_id] = item
+
+        if not by_reference:
+            return results
+
+        def pick(index: int, payment_column=Order.payment_id, reference_column=Order.id, references=by_reference,
+                 payments=by_payment):
+            """CASE choosing each row's value from its callback, by payment_id first, then by reference"""
+            by_payment_id = case({key: item[index] for key, item in payments.items()}, value=payment_column)
+            by_reference_id = case({key: item[index] for key, item in references.items()}, value=reference_column)
+            if not payments:
+                return by_reference_id
+            if not references:
+                return by_payment_id
+            return case((payment_column.in_(payments), by_payment_id), else_=by_reference_id)
+
+        # Payments still NEW, e.g. settled by the gateway rather than /payment/process, or PROCESSING
+        # while a charge is in flight: the gateway's callback is authoritative.
+        # Callbacks without a payment_id find theirs by reference_id, which is stored as a string.
+        payment_references = {str(key): item for key, item in by_reference.items() if item[3].payment_id is None}
+        payment_options = dict(payment_column=PaymentRequest.payment_id,
+                               reference_column=PaymentRequest.reference_id, references=payment_references)
+        # Orders are matched by every settled payment_id, including the ones only known by reference
+        order_payments = dict(by_payment)
+        if by_payment or payment_references:
+            changed_payments = db.execute(
+                update(PaymentRequest)
+                .where(or_(PaymentRequest.payment_id.in_(by_payment),
+                           PaymentRequest.reference_id.in_(payment_references)),
+                       PaymentRequest.status.in_(("NEW", "PROCESSING")))
+                .values(status=pick(0, **payment_options), trx_number=pick(2, **payment_options))
+                .returning(PaymentRequest.payment_id, PaymentRequest.reference_id, PaymentRequest.status,
+                           PaymentRequest.trx_number)
+                .execution_options(synchronize_session=False)
+            ).all()
+            for row in changed_payments:
+                if row.payment_id not in order_payments:
+                    order_payments[row.payment_id] = payment_references[row.reference_id]
+                publish_after_commit(db, row.payment_id, row.status, row.trx_number)
+
+        condition = Order.id.in_(by_reference)
+        if order_payments:
+            condition = or_(condition, Order.payment_id.in_(order_payments))
+        settled = db.execute(
+            update(Order)
+            .where(condition, Order.status == "INITIATED")
+            .values(status=pick(1, payments=order_payments), trx_number=pick(2, payments=order_payments))
+            .returning(Order.id, Order.payment_id, Order.user_id, Order.price, Order.status)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        deltas = {}
+        for row in settled:
+            item = order_payments.get(row.payment_id) or by_reference[row.id]
+            item[3].orders_settled += 1
+            merge_deltas(deltas.setdefault(row.user_id, {}), summary_delta("INITIATED", row.status, row.price))
+        summaries = OrderSummaryService(db)
+        for user_id, delta in deltas.items():
+            summaries.apply_delta(user_id, delta)
+
+        # Tell already settled payments apart from unknown ones
+        unsettled = [item[3] for item in by_reference.values() if not item[3].orders_settled]
+        if unsettled:
+            payment_ids = [result.payment_id for result in unsettled if result.payment_id is not None]
+            existing = db.execute(
+                select(Order.id, Order.payment_id)
+                .where(or_(Order.id.in_([result.reference_id for result in unsettled]),
+                           Order.payment_id.in_(payment_ids)))
+            ).all()
+            known_ids = {row.id for row in existing}
+            known_payments = {row.payment_id for row in existing}
+            for result in unsettled:
+                found = result.reference_id in known_ids or result.payment_id in known_payments
+                result.result = "ALREADY_SETTLED" if found else "NOT_FOUND"
+
+        return results
+
+    def initiate(self, order_request: CreateOrderRequest, user: User) -> InitiateOrderResponse:
+        """
+        Create the order and its payment request in one transaction, without refresh round trips
+        """
+        payment_id, _, _ = self._create_orders_with_payment(user, [(order_request.product_id, order_request.quantity)])
+
+        return InitiateOrderResponse(payment_url=f"{settings.PAYMENT_BASE_URL}/payment/{payment_id}")
+
+    def checkout(self, checkout_request: CheckoutRequest, user: User) -> CheckoutResponse:
+        """
+        Create one order per cart line and a single payment request for the whole cart, in one transaction
+        """
+        payment_id, order_ids, total_price = self._create_orders_with_payment(user, [
+            (item.product_id, item.quantity) for item in checkout_request.items
+        ])
+
+        return CheckoutResponse(
+            payment_url=f"{settings.PAYMENT_BASE_URL}/payment/{payment_id}",
+            order_ids=order_ids,
+            total_price=total_price
         )
 
-        self.db.add(new_order)
-        self.db.commit()
-        self.db.refresh(new_order)
+    def _create_orders_with_payment(self, user: User, lines: list) -> tuple:
+        """
+        Insert (product_id, quantity) lines and one payment request for their total.
+        Each order keeps a snapshot of the product so it can be read back without the product row.
+
+        Prices and snapshots are read from the primary with one IN query in the same transaction,
+        never from the catalog cache, which can lag behind imports made by other processes.
+        Uses INSERT ... RETURNING so generated ids come back with the insert itself,
+        then commits once. Returns (payment_id, order_ids, total_price).
+        """
+        try:
+            product_ids = list(dict.fromkeys(product_id for product_id, _ in lines))
+            products = {product.id: product
+                        for product in self.db.scalars(select(Product).where(Product.id.in_(product_ids)))}
+            missing_ids = [product_id for product_id in product_ids if product_id not in products]
+            if missing_ids:
+                raise ValueError(f"Product with ID {missing_ids[0]} not found")
+
+            rows = [
+                {
+                    "user_id": user.id,
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "price": calculate_price(products[product_id].price, quantity),
+                    "status": "INITIATED",
+                    "product_title": products[product_id].title,
+                    "product_description": products[product_id].description,
+                    "product_location": products[product_id].location,
+                    "unit_price": products[product_id].price
+                }
+                for product_id, quantity in lines
+            ]
+            total_price = sum(row["price"] for row in rows)
+
+            order_ids = list(self.db.scalars(
+                insert(Order).returning(Order.id, sort_by_parameter_order=True),
+                rows
+            ))
+            payment_id = self.db.execute(
+                insert(PaymentRequest)
+                .values(reference_id=order_ids[0], price=total_price, status="NEW",
+                        redirect_url=settings.PAYMENT_REDIRECT_URL,
+                        callback_url=settings.PAYMENT_CALLBACK_URL)
+                .returning(PaymentRequest.payment_id)
+            ).scalar_one()
 
-        payment = self.mock_initialize_payment(new_order.id, new_order.price)
+            # A single order is settled through reference_id, only cart lines need the link
+            if len(order_ids) > 1:
+                self.db.execute(update(Order).where(Order.id.in_(order_ids)).values(payment_id=payment_id))
 
-        return InitiateOrderResponse(payment_url=f"{settings.PAYMENT_BASE_URL}/payment/{payment.payment_id}")
+            OrderSummaryService(self.db).apply_delta(user.id, {
+                "total_orders": len(order_ids),
+                "initiated_orders": len(order_ids)
+            })
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
 
-    def mock_initialize_payment(self, order_id: int, price: float) -> PaymentRequest:
-        new_payment = PaymentRequest(reference_id=order_id, price=price, status="NEW",
-                                     redirect_url=settings.PAYMENT_REDIRECT_URL,
-                                     callback_url=settings.PAYMENT_CALLBACK_URL)
-        self.db.add(new_payment)
-        self.db.commit()
-        self.db.refresh(new_payment)
-        return new_payment
+        return payment_id, order_ids, total_price
 
-    def get_orders(self, user: User,product_service: ProductService, page: int = 1, size: int = 10) -> PaginatedResponse[OrderResponse]:
+    def get_summary(self, user: User) -> OrderSummaryResponse:
         """
-        Get paginated orders for a specific user
+        Get the user's order totals and per-status counts without scanning their orders
+        """
+        return OrderSummaryService(self.db).get_summary(user.id)
+
+    def get_orders(self, user: User, product_service: ProductService, page: int = 1, size: int = 10,
+                   include_total: bool = True) -> PaginatedResponse[OrderResponse]:
+        """
+        Get paginated orders for a specific user.
+        With include_total=False the count query is skipped and has_next comes from fetching size+1 rows.
         """
         # Calculate offset
         offset = (page - 1) * size
 
-        # Get orders for the user with pagination
-        orders = (self.db.query(Order)
+        # Get orders for the user with pagination, plus one extra row to detect a next page
+        orders = (self.read_db.query(Order)
                   .filter(Order.user_id == user.id)
-                  .order_by(Order.created_at.desc())
+                  .order_by(Order.created_at.desc(), Order.id.desc())
                   .offset(offset)
-                  .limit(size)
+                  .limit(size + 1)
                   .all())
+        has_next = len(orders) > size
+        orders = orders[:size]
+
+        return self._build_page(user, orders, product_service, page, size, has_next, include_total)
 
+    def get_orders_after(self, user: User, product_service: ProductService, cursor: str = None,
+                         size: int = 10, include_total: bool = True) -> PaginatedResponse[OrderResponse]:
+        """
+        Get a page of a user's orders using keyset pagination on (created_at, id), newest first
+        """
+        page = 1
+        query = self.read_db.query(Order).filter(Order.user_id == user.id)
+        if cursor:
+            position = decode_cursor(cursor)
+            try:
+                last_created_at = datetime.fromisoformat(position["created_at"])
+                last_id = int(position["id"])
+                page = int(position.get("page", 1))
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Invalid pagination cursor")
+            query = query.filter(tuple_(Order.created_at, Order.id) < (last_created_at, last_id))
+
+        orders = (query
+                  .order_by(Order.created_at.desc(), Order.id.desc())
+                  .limit(size + 1)
+                  .all())
+        has_next = len(orders) > size
+        orders = orders[:size]
+
+        result = self._build_page(user, orders, product_service, page, size, has_next, include_total)
+        if has_next:
+            result.next_cursor = encode_cursor({
+                "created_at": orders[-1].created_at.isoformat(),
+                "id": orders[-1].id,
+                "page": page + 1
+            })
+        return result
+
+    def _build_page(self, user: User, orders: list, product_service: ProductService, page: int, size: int,
+                    has_next: bool, include_total: bool) -> PaginatedResponse[OrderResponse]:
         # Get total count for the user
-        total_count = self.db.query(Order).filter(Order.user_id == user.id).count()
-
-        # Calculate pagination info
-        total_pages = (total_count + size - 1) // size
-        has_next = page < total_pages
-        has_previous = page > 1
-
-        # Convert to response format
-        order_responses = [
-            OrderResponse(
-                order_id=order.id,
-                trx_id=order.trx_number or "",
-                product =product_service.get_product_by_id(order.product_id),
-                quantity=order.quantity,
-                price=order.price,
-                status=order.status,
-                created_at=order.created_at
-            )
-            for order in orders
-        ]
+        total_count = None
+        total_pages = None
+        if include_total:
+            total_count = self.read_db.query(Order).filter(Order.user_id == user.id).count()
+            total_pages = (total_count + size - 1) // size
+
+        # Orders carry a product snapshot, only older orders need a batched product lookup
+        products = self._resolve_products(orders, product_service)
+        order_responses = [self._to_order_response(order, products) for order in orders]
 
         return PaginatedResponse[OrderResponse](
             content=order_responses,
@@ -100,22 +343,100 @@ class OrderService:
             size=size,
             total_pages=total_pages,
             has_next=has_next,
-            has_previous=has_previous
+            has_previous=page > 1
         )
 
     def get_order(self, order_id, user: User, product_service: ProductService):
-        order = self.db.query(Order).filter(
+        order = self.read_db.query(Order).filter(
             (Order.user_id == user.id) & (Order.id == order_id)
         ).first()
         if not order:
             raise ValueError(f"Order {order_id} not found")
 
+        products = self._resolve_products([order], product_service)
+        return self._to_order_response(order, products)
+
+    @staticmethod
+    def _resolve_products(orders, product_service: ProductService) -> dict:
+        """
+        Load the products of orders placed before product snapshots existed,
+        with a single batched lookup keyed by product ID
+        """
+        product_ids = [order.product_id for order in orders if order.product_title is None]
+        if not product_ids:
+            return {}
+
+        batch = product_service.get_products_by_ids(product_ids)
+        if batch.missing_ids:
+            raise ValueError(f"Product with ID {batch.missing_ids[0]} not found")
+        return {product.id: product for product in batch.content}
+
+    @staticmethod
+    def _to_order_response(order: Order, products: dict) -> OrderResponse:
+        if order.product_title is not None:
+            product = ProductResponse(
+                id=order.product_id,
+                title=order.product_title,
+                description=order.product_description or "",
+                price=order.unit_price,
+                location=order.product_location or ""
+            )
+        else:
+            product = products[order.product_id]
+
         return OrderResponse(
             order_id=order.id,
-            trx_id=order.trx_number,
-            product=product_service.get_product_by_id(order.product_id),
+            trx_id=order.trx_number or "",
+            product=product,
             quantity=order.quantity,
             price=order.price,
-            status= order.status,
-            created_at=order.created_at,
+            status=order.status,
+            created_at=order.created_at
         )
+
+    def export_orders(self, user_id: Optional[int] = None, export_format: str = "ndjson",
+                      chunk_size: int = 500) -> Iterator[str]:
+        """
+        Stream orders (one user's, or everyone's when user_id is None) as NDJSON or CSV.
+
+        Rows come from a server-side cursor in yield_per batches and are written out
+        in chunks, so memory stays flat however many orders there are.
+        """
+        query = (
+            select(
+                Order.id.label("order_id"),
+                Order.user_id,
+                Order.product_id,
+                func.coalesce(Order.product_title, Product.title).label("product_title"),
+                func.coalesce(Order.product_location, Product.location).label("product_location"),
+                func.coalesce(Order.unit_price, Product.price).label("unit_price"),
+                Order.quantity,
+                Order.price,
+                Order.status,
+                Order.trx_number,
+                Order.created_at
+            )
+            .outerjoin(Product, Product.id == Order.product_id)
+            .order_by(Order.id)
+            .execution_options(stream_results=True, yield_per=chunk_size)
+        )
+        if user_id is not None:
+            query = query.where(Order.user_id == user_id)
+
+        if export_format == "csv":
+            yield ",".join(EXPORT_COLUMNS) + "\r\n"
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for partition in self.read_db.execute(query).partitions():
+            for row in partition:
+                values = row._asdict()
+                values["created_at"] = values["created_at"].isoformat() if values["created_at"] else None
+                if export_format == "csv":
+                    writer.writerow([values[column] for column in EXPORT_COLUMNS])
+                else:
+                    buffer.write(json.dumps(values))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
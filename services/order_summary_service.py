@@ -0,0 +1,119 @@
+from datetime import datetime
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from modles.order_models import Order, UserOrderSummary
+from schemas.orders_schemas import OrderSummaryResponse
+
+# Summary counter for each order status
+STATUS_COUNTERS = {
+    "INITIATED": "initiated_orders",
+    "SUCCESS": "successful_orders",
+    "FAILED": "failed_orders",
+    "EXPIRED": "expired_orders",
+}
+
+
+def summary_delta(old_status: str = None, new_status: str = None, price: float = 0.0) -> dict:
+    """
+    Counter changes for one order moving from old_status to new_status.
+    old_status=None means a new order, only SUCCESS orders count towards total_spent.
+    """
+    delta = {}
+    if old_status == new_status:
+        return delta
+    if old_status is None:
+        delta["total_orders"] = 1
+    for status, sign in ((old_status, -1), (new_status, 1)):
+        if status in STATUS_COUNTERS:
+            delta[STATUS_COUNTERS[status]] = delta.get(STATUS_COUNTERS[status], 0) + sign
+        if status == "SUCCESS":
+            delta["total_spent"] = delta.get("total_spent", 0.0) + sign * price
+    return delta
+
+
+def merge_deltas(target: dict, delta: dict) -> dict:
+    for column, value in delta.items():
+        target[column] = target.get(column, 0) + value
+    return target
+
+
+class OrderSummaryService:
+    """
+    Keeps UserOrderSummary rows in step with the orders table.
+
+    Callers apply deltas inside their own transaction, after the order changes
+    are flushed, and commit them together. A user without a summary row gets
+    one computed from their orders instead, which already includes those changes.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def apply_delta(self, user_id: int, delta: dict) -> None:
+        """Add the counter changes with one atomic UPDATE, backfilling the row when missing"""
+        delta = {column: value for column, value in delta.items() if value}
+        if not delta:
+            return
+
+        values = {column: getattr(UserOrderSummary, column) + value for column, value in delta.items()}
+        result = self.db.execute(
+            update(UserOrderSummary)
+            .where(UserOrderSummary.user_id == user_id)
+            .values(**values, updated_at=datetime.now())
+        )
+        if result.rowcount:
+            return
+
+        try:
+            with self.db.begin_nested():
+                self._insert_backfill(user_id)
+        except IntegrityError:
+            # Another transaction created the row first, its counts do not include our changes
+            self.db.execute(
+                update(UserOrderSummary)
+                .where(UserOrderSummary.user_id == user_id)
+                .values(**values, updated_at=datetime.now())
+            )
+
+    def get_summary(self, user_id: int) -> OrderSummaryResponse:
+        """O(1) read of a user's aggregates, computed once from their orders on first access"""
+        summary = self.db.get(UserOrderSummary, user_id)
+        if summary is None:
+            try:
+                summary = self._insert_backfill(user_id)
+                self.db.commit()
+            except IntegrityError:
+                self.db.rollback()
+                summary = self.db.get(UserOrderSummary, user_id)
+
+        return OrderSummaryResponse(
+            total_orders=summary.total_orders,
+            total_spent=summary.total_spent,
+            initiated_orders=summary.initiated_orders,
+            successful_orders=summary.successful_orders,
+            failed_orders=summary.failed_orders,
+            expired_orders=summary.expired_orders,
+            updated_at=summary.updated_at
+        )
+
+    def _insert_backfill(self, user_id: int) -> UserOrderSummary:
+        counters = {
+            column: func.coalesce(func.sum(case((Order.status == status, 1), else_=0)), 0)
+            for status, column in STATUS_COUNTERS.items()
+        }
+        row = self.db.execute(
+            select(
+                func.count(Order.id).label("total_orders"),
+                func.coalesce(func.sum(case((Order.status == "SUCCESS", Order.price), else_=0)), 0)
+                .label("total_spent"),
+                *(expression.label(column) for column, expression in counters.items())
+            ).where(Order.user_id == user_id)
+        ).one()
+
+        summary = UserOrderSummary(user_id=user_id, **row._asdict())
+        self.db.add(summary)
+        self.db.flush()
+        return summary
@@ -0,0 +1,247 @@
+import asyncio
+import random
+import string
+import time
+from typing import Optional
+
+import httpx
+from pydantic import BaseModel
+
+from config.setting import settings
+from schemas.orders_schemas import ProcessPayment
+
+
+def deduct_amount(request: ProcessPayment, amount: float) -> bool:
+    """
+    Mock function to simulate payment processing
+    Returns False if card number ends with '0000' (simulate failed payment)
+    """
+    if request.card_number.endswith("0000"):
+        return False
+    else:
+        return True
+
+
+def _generate_reference() -> str:
+    """Generate random transaction reference"""
+    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=7))
+
+
+class ChargeResult(BaseModel):
+    approved: bool
+    transaction_reference: str
+
+
+class PaymentGatewayError(Exception):
+    """
+    The gateway could not be reached or did not give a usable answer.
+
+    `not_charged` is only set when the card certainly was not charged: the request never
+    left, the circuit was open or the gateway refused it. Otherwise, e.g. after a read
+    timeout or a 5xx, the charge may have gone through and only the gateway knows.
+    """
+
+    def __init__(self, message: str, not_charged: bool = False):
+        super().__init__(message)
+        self.not_charged = not_charged
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_seconds`, then lets a single trial call through (half-open) to decide
+    whether to close again.
+    """
+
+    def __init__(self, failure_threshold: int = settings.PAYMENT_GATEWAY_BREAKER_FAILURES,
+                 reset_seconds: float = settings.PAYMENT_GATEWAY_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def release_trial(self) -> None:
+        """The call ended without an outcome, e.g. it was cancelled, let the next call be the trial"""
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+class PaymentGateway:
+    """Interface of payment gateways, created and closed by the application lifespan"""
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def charge(self, payment_id: int, amount: float, request: ProcessPayment) -> ChargeResult:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {"gateway": type(self).__name__}
+
+
+class MockPaymentGateway(PaymentGateway):
+    """In-process gateway, approves every card except those ending in 0000"""
+
+    async def charge(self, payment_id: int, amount: float, request: ProcessPayment) -> ChargeResult:
+        return ChargeResult(approved=deduct_amount(request, amount), transaction_reference=_generate_reference())
+
+
+class HttpPaymentGateway(PaymentGateway):
+    """
+    Gateway reached over HTTP through one pooled keep-alive client.
+
+    Every call has connect/read timeouts. Timeouts, transport errors and 5xx
+    answers are retried with exponential backoff and full jitter, using the
+    payment id as idempotency key so a retry never charges twice. A circuit
+    breaker fails fast while the gateway keeps failing.
+
+    Raised errors say whether the card may have been charged: once a request
+    may have reached the gateway, a later failure is never reported as a
+    definite non-charge.
+    """
+
+    def __init__(self, base_url: str = settings.PAYMENT_GATEWAY_URL,
+                 max_retries: int = settings.PAYMENT_GATEWAY_MAX_RETRIES,
+                 backoff_seconds: float = settings.PAYMENT_GATEWAY_RETRY_BACKOFF_SECONDS,
+                 breaker: Optional[CircuitBreaker] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.breaker = breaker or CircuitBreaker()
+        self.transport = transport
+        self.client: Optional[httpx.AsyncClient] = None
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def start(self) -> None:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(settings.PAYMENT_GATEWAY_TIMEOUT_SECONDS,
+                                      connect=settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(max_connections=settings.PAYMENT_GATEWAY_MAX_CONNECTIONS,
+                                    max_keepalive_connections=settings.PAYMENT_GATEWAY_MAX_CONNECTIONS),
+                transport=self.transport
+            )
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def charge(self, payment_id: int, amount: float, request: ProcessPayment) -> ChargeResult:
+        if self.client is None:
+            raise PaymentGatewayError("Payment gateway client is not started", not_charged=True)
+
+        self.calls += 1
+        last_error = "no attempt made"
+        # Whether any attempt may have reached the gateway
+        sent = False
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1)))
+            if not self.breaker.allow():
+                self.failures += 1
+                raise PaymentGatewayError("Payment gateway circuit is open, try again later", not_charged=not sent)
+
+            try:
+                response = await self.client.post(
+                    "/charges",
+                    json={
+                        "amount": amount,
+                        "card_number": request.card_number,
+                        "cvv": request.cvv,
+                        "expiry_date": request.expiry_date,
+                        "reference": str(payment_id)
+                    },
+                    headers={"Idempotency-Key": f"payment-{payment_id}"}
+                )
+            except httpx.TransportError as e:
+                # Timeouts are transport errors too. Only a failed connection proves nothing was sent,
+                # a read timeout may come after the gateway charged the card.
+                sent = sent or not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+                self.breaker.record_failure()
+                last_error = f"{type(e).__name__}: {e}"
+                continue
+            except BaseException:
+                # Cancelled, e.g. the client disconnected, or failed before reaching the gateway.
+                # A half-open breaker must not keep waiting for this trial's outcome.
+                self.breaker.release_trial()
+                raise
+
+            if response.status_code >= 500:
+                sent = True
+                self.breaker.record_failure()
+                last_error = f"gateway answered {response.status_code}"
+                continue
+
+            self.breaker.record_success()
+            if response.status_code >= 400:
+                self.failures += 1
+                raise PaymentGatewayError(f"Payment gateway rejected the request: {response.text}",
+                                          not_charged=not sent)
+            body = response.json()
+            return ChargeResult(approved=body["status"] == "APPROVED",
+                                transaction_reference=body["transaction_reference"])
+
+        self.failures += 1
+        raise PaymentGatewayError(f"Payment gateway unavailable after {self.max_retries + 1} attempts ({last_error})",
+                                  not_charged=not sent)
+
+    def stats(self) -> dict:
+        return {
+            "gateway": type(self).__name__,
+            "base_url": self.base_url,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "circuit": self.breaker.stats()
+        }
+
+
+def create_payment_gateway() -> PaymentGateway:
+    if settings.PAYMENT_GATEWAY == "http":
+        return HttpPaymentGateway()
+    return MockPaymentGateway()
+
+
+payment_gateway = create_payment_gateway()
@@ -0,0 +1,171 @@
+import asyncio
+import uuid
+from datetime import datetime
+from typing import List, Optional, Set
+
+from sqlalchemy.orm import sessionmaker
+
+from config.setting import settings
+from database import SessionLocal
+from schemas.orders_schemas import PaymentJobResponse, ProcessPayment
+from services.order_service import OrderService
+from services.payment_gateway import PaymentGateway, payment_gateway
+from services.payment_service import PaymentService
+from utils.lru_cache import LRUCache
+
+
+class PaymentQueueFull(Exception):
+    """Raised when the payment queue is at PAYMENT_QUEUE_MAX_SIZE or shutting down"""
+
+
+class PaymentQueue:
+    """
+    Bounded queue of payment jobs drained by a fixed pool of workers.
+
+    Each worker processes one payment at a time with its own session: the
+    database steps run in a thread and the gateway call is awaited, so at
+    most `workers` payments are in flight and the event loop is never
+    blocked. Jobs are kept in memory, per process, for
+    PAYMENT_JOB_TTL_SECONDS so clients can poll their status.
+    """
+
+    def __init__(self, session_factory: sessionmaker, gateway: PaymentGateway,
+                 max_size: int = settings.PAYMENT_QUEUE_MAX_SIZE,
+                 workers: int = settings.PAYMENT_QUEUE_WORKERS,
+                 shutdown_timeout_seconds: float = settings.PAYMENT_QUEUE_SHUTDOWN_TIMEOUT_SECONDS):
+        self.session_factory = session_factory
+        self.gateway = gateway
+        self.max_size = max_size
+        self.workers = workers
+        self.shutdown_timeout_seconds = shutdown_timeout_seconds
+        self.jobs = LRUCache(max_size=settings.PAYMENT_JOB_CACHE_SIZE, ttl_seconds=settings.PAYMENT_JOB_TTL_SECONDS)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._busy: Set[asyncio.Task] = set()
+        self._stopping = False
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        # Created here so the queue belongs to the running event loop
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Stop taking jobs and let the payments in flight finish, up to PAYMENT_QUEUE_SHUTDOWN_TIMEOUT_SECONDS.
+        Cancelling a worker mid-step would leave its database step running in a thread while the
+        session is closed, and the claimed payment stuck. Queued jobs that never started are failed,
+        their payments were not claimed and can be retried.
+        """
+        if not self._tasks:
+            return
+        self._stopping = True
+        while not self._queue.empty():
+            job_id, _ = self._queue.get_nowait()
+            self._update(job_id, status="FAILED", error="Payment queue shut down before processing the job",
+                         finished_at=datetime.now())
+            self._queue.task_done()
+
+        # Idle workers are waiting for a job, cancelling them there is safe
+        for task in self._tasks:
+            if task not in self._busy:
+                task.cancel()
+        busy = [task for task in self._tasks if task in self._busy]
+        if busy:
+            _, unfinished = await asyncio.wait(busy, timeout=self.shutdown_timeout_seconds)
+            for task in unfinished:
+                print("Payment queue shutdown timed out, cancelling a worker mid-payment")
+                task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._busy.clear()
+
+    def submit(self, request: ProcessPayment) -> PaymentJobResponse:
+        """Queue a payment and return its job, raises PaymentQueueFull when the queue is full"""
+        if self._queue is None:
+            raise RuntimeError("Payment queue is not running")
+        if self._stopping:
+            raise PaymentQueueFull("Payment queue is shutting down, retry later")
+
+        job = PaymentJobResponse(
+            job_id=uuid.uuid4().hex,
+            payment_id=request.payment_id,
+            status="QUEUED",
+            created_at=datetime.now()
+        )
+        try:
+            self._queue.put_nowait((job.job_id, request))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise PaymentQueueFull("Payment queue is full, retry later")
+
+        self.jobs.set(job.job_id, job)
+        return job
+
+    def get_job(self, job_id: str) -> PaymentJobResponse:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Payment job {job_id} not found")
+        return job
+
+    async def _worker(self) -> None:
+        task = asyncio.current_task()
+        while not self._stopping:
+            job_id, request = await self._queue.get()
+            self._busy.add(task)
+            try:
+                self._update(job_id, status="PROCESSING")
+                await self._process(job_id, request)
+            finally:
+                self._busy.discard(task)
+                self._queue.task_done()
+
+    async def _process(self, job_id: str, request: ProcessPayment) -> None:
+        """Database steps run in a thread, the gateway call is awaited on the event loop"""
+        db = self.session_factory()
+        try:
+            payment_service = PaymentService(db)
+            payment_details = await asyncio.to_thread(payment_service.prepare_payment, request)
+            try:
+                charge = await self.gateway.charge(payment_details.payment_id, payment_details.price, request)
+            except Exception as e:
+                await asyncio.to_thread(payment_service.charge_failed, payment_details.payment_id, e)
+                raise Exception(f"Payment processing failed: {str(e)}")
+            except asyncio.CancelledError as e:
+                # Only a shutdown that timed out cancels a worker, the charge may be under way
+                payment_service.charge_failed(payment_details.payment_id, e)
+                raise
+            callback = await asyncio.to_thread(payment_service.settle_payment, payment_details, charge,
+                                               OrderService(db))
+            self.processed += 1
+            self._update(job_id, status="COMPLETED", result=callback, finished_at=datetime.now())
+        except Exception as e:
+            self.failed += 1
+            self._update(job_id, status="FAILED", error=str(e), finished_at=datetime.now())
+        finally:
+            db.close()
+
+    def _update(self, job_id: str, **changes) -> None:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            self.jobs.set(job_id, job.model_copy(update=changes))
+
+    def stats(self) -> dict:
+        return {
+            "running": bool(self._tasks) and not self._stopping,
+            "in_flight": len(self._busy),
+            "workers": self.workers,
+            "max_size": self.max_size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected
+        }
+
+
+payment_queue = PaymentQueue(SessionLocal, payment_gateway)
@@ -1,31 +1,20 @@
-import random
-import string
+import asyncio
+
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
 from modles.order_models import PaymentRequest
 from schemas.orders_schemas import ProcessPayment, PaymentCallback
 from services.order_service import OrderService
-
-
-def deduct_amount(request: ProcessPayment, amount: float) -> bool:
-    """
-    Mock function to simulate payment processing
-    Returns False if card number ends with '0000' (simulate failed payment)
-    """
-    if request.card_number.endswith("0000"):
-        return False
-    else:
-        return True
-
-
-def _generate_reference() -> str:
-    """Generate random transaction reference"""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=7))
+from services.payment_gateway import ChargeResult, PaymentGateway, PaymentGatewayError
+from utils.payment_events import payment_event, publish_after_commit
 
 
 class PaymentService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, read_db: Session = None):
         self.db = db
+        # Status polling may read from a replica, processing always uses the primary
+        self.read_db = read_db if read_db is not None else db
 
     def get_payment_details(self, payment_id: int) -> PaymentRequest:
         """
@@ -37,64 +26,131 @@ class PaymentService:
         except Exception as e:
             raise ValueError(f"Failed to retrieve payment with ID {payment_id}: {str(e)}")
 
-    def process_payment(self, request: ProcessPayment, order_service: OrderService) -> PaymentCallback:
+    async def process_payment(self, request: ProcessPayment, order_service: OrderService,
+                              gateway: PaymentGateway) -> PaymentCallback:
         """
         Process payment and update order status
         """
+        payment_details = self.prepare_payment(request)
+        try:
+            charge = await gateway.charge(payment_details.payment_id, payment_details.price, request)
+        except Exception as e:
+            self.charge_failed(payment_details.payment_id, e)
+            raise Exception(f"Payment processing failed: {str(e)}")
+        except asyncio.CancelledError as e:
+            # The client went away while the gateway was charging
+            self.charge_failed(payment_details.payment_id, e)
+            raise
+        return self.settle_payment(payment_details, charge, order_service)
+
+    def prepare_payment(self, request: ProcessPayment) -> PaymentRequest:
+        """
+        Validate the request and claim the payment before it is charged.
+        The claim commits on its own, so no connection is held while the gateway answers.
+        """
+        # Validate request
+        if not request.payment_id:
+            raise ValueError("Payment ID is required")
+        if not request.card_number:
+            raise ValueError("Card number is required")
+        if not request.cvv:
+            raise ValueError("CVV is required")
+        if not request.expiry_date:
+            raise ValueError("Expiry date is required")
+
         try:
-            # Validate request
-            if not request.payment_id:
-                raise ValueError("Payment ID is required")
-            if not request.card_number:
-                raise ValueError("Card number is required")
-            if not request.cvv:
-                raise ValueError("CVV is required")
-            if not request.expiry_date:
-                raise ValueError("Expiry date is required")
-
-            # Get payment details
-            payment_details = self.get_payment_details(request.payment_id)
-            if not payment_details:
-                raise ValueError(f"Payment with ID {request.payment_id} not found")
-
-            # Validate payment status
-            if payment_details.status != "NEW":
-                raise ValueError(f"Payment already processed with status: {payment_details.status}")
-
-            # Process payment
-            transaction_reference = _generate_reference()
-
-            if deduct_amount(request, payment_details.price):
-                # Payment successful
-                callback = PaymentCallback(
-                    trx_number=transaction_reference,
-                    reference_id=payment_details.reference_id,
-                    status="CAPTURED"
-                )
-
-                # Update payment status
-                payment_details.status = "CAPTURED"
-                payment_details.trx_number = transaction_reference
-
-            else:
-                # Payment failed
-                callback = PaymentCallback(
-                    trx_number=transaction_reference,
-                    reference_id=payment_details.reference_id,
-                    status="FAILED"
-                )
-
-                # Update payment status
-                payment_details.status = "FAILED"
-                payment_details.trx_number = transaction_reference
-
-            # Save payment status
-            self.db.add(payment_details)
+            # Compare-and-set NEW -> PROCESSING, only one concurrent attempt gets to charge
+            payment_details = self.db.scalars(
+                update(PaymentRequest)
+                .where(PaymentRequest.payment_id == request.payment_id, PaymentRequest.status == "NEW")
+                .values(status="PROCESSING")
+                .returning(PaymentRequest)
+            ).one_or_none()
+            if payment_details is None:
+                self.db.rollback()
+                current = self.get_payment_details(request.payment_id)
+                if not current:
+                    raise ValueError(f"Payment with ID {request.payment_id} not found")
+                raise ValueError(f"Payment already processed with status: {current.status}")
+
+            publish_after_commit(self.db, payment_details.payment_id, "PROCESSING")
+            self.db.expunge(payment_details)
             self.db.commit()
-            self.db.refresh(payment_details)
+            return payment_details
 
+        except ValueError:
+            raise
+        except Exception as e:
+            self.db.rollback()
+            raise Exception(f"Payment processing failed: {str(e)}")
 
-            order_service.mock_payment_callback(callback, self.db)
+    def charge_failed(self, payment_id: int, error: BaseException) -> None:
+        """
+        Deal with a claimed payment whose charge raised. Only a definite non-charge is released
+        for a retry. Otherwise the card may have been charged, so the payment stays PROCESSING,
+        which the sweeper leaves alone, until the gateway's callback settles it.
+        """
+        if isinstance(error, PaymentGatewayError) and error.not_charged:
+            self.release_payment(payment_id)
+            return
+        print(f"Payment {payment_id} left PROCESSING, charge outcome unknown "
+              f"({type(error).__name__}: {error}), waiting for the gateway callback")
+
+    def release_payment(self, payment_id: int) -> None:
+        """
+        Hand a claimed payment back (PROCESSING -> NEW) when the gateway certainly did not
+        charge it, so it can be retried
+        """
+        try:
+            released = self.db.execute(
+                update(PaymentRequest)
+                .where(PaymentRequest.payment_id == payment_id, PaymentRequest.status == "PROCESSING")
+                .values(status="NEW")
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if released:
+                publish_after_commit(self.db, payment_id, "NEW")
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            print(f"Failed to release payment {payment_id}: {e}")
+
+    def settle_payment(self, payment_details: PaymentRequest, charge: ChargeResult,
+                       order_service: OrderService) -> PaymentCallback:
+        """
+        Record the gateway's answer for a claimed payment and settle its orders in one
+        transaction, locking the payment before the orders
+        """
+        try:
+            status = "CAPTURED" if charge.approved else "FAILED"
+            callback = PaymentCallback(
+                trx_number=charge.transaction_reference,
+                reference_id=payment_details.reference_id,
+                status=status,
+                payment_id=payment_details.payment_id
+            )
+
+            # Compare-and-set PROCESSING -> CAPTURED/FAILED, the claim keeps other attempts and the sweeper out
+            settled = self.db.execute(
+                update(PaymentRequest)
+                .where(PaymentRequest.payment_id == payment_details.payment_id,
+                       PaymentRequest.status == "PROCESSING")
+                .values(status=status, trx_number=charge.transaction_reference)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not settled:
+                # A gateway callback settled the payment while the charge was in flight
+                self.db.rollback()
+                current = self.get_payment_details(payment_details.payment_id)
+                if current.status != status:
+                    print(f"Payment {payment_details.payment_id} needs reconciliation: charge "
+                          f"{charge.transaction_reference} was {status} but the payment is {current.status}")
+                raise ValueError(f"Payment already processed with status: {current.status}")
+
+            # Settle the orders in the same transaction, subscribers hear about it once it commits
+            order_service.apply_payment_result(callback, self.db)
+            publish_after_commit(self.db, payment_details.payment_id, status, charge.transaction_reference)
+            self.db.commit()
 
             return callback
 
@@ -106,12 +162,22 @@ class PaymentService:
             self.db.rollback()
             raise Exception(f"Payment processing failed: {str(e)}")
 
+    def get_payment_event(self, payment_id: int) -> dict:
+        """
+        Current status of a payment as a payment event, read from the primary
+        so a subscriber never starts from a stale status
+        """
+        payment = self.get_payment_details(payment_id)
+        if not payment:
+            raise ValueError(f"Payment with ID {payment_id} not found")
+        return payment_event(payment.payment_id, payment.status, payment.trx_number)
+
     def get_payment_status(self, payment_id: int) -> dict:
         """
         Get current payment status
         """
         try:
-            payment = self.get_payment_details(payment_id)
+            payment = self.read_db.get(PaymentRequest, payment_id)
             if not payment:
                 raise ValueError(f"Payment with ID {payment_id} not found")
 
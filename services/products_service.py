@@ -1,75 +1,122 @@
+from sqlalchemy import select, func, cast, Integer
 from sqlalchemy.orm import Session
 from modles.product_models import Product
-from schemas.products_schemas import ProductResponse
+from config.setting import settings
+from schemas.products_schemas import (
+    ProductResponse,
+    ProductBatchResponse,
+    ProductFacetsResponse,
+    LocationFacet,
+    PriceBucket
+)
 from schemas.api_response_schemas import PaginatedResponse
+from utils.catalog_cache import CatalogCache, catalog_cache
+from utils.pagination import encode_cursor, decode_cursor
+from utils.search_index import ProductSearchIndex, product_search_index
+
+
+def to_product_response(product: Product) -> ProductResponse:
+    return ProductResponse(
+        id=product.id,
+        title=product.title,
+        description=product.description,
+        price=product.price,
+        location=product.location
+    )
 
 
 class ProductService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, cache: CatalogCache = catalog_cache,
+                 search_index: ProductSearchIndex = product_search_index, read_db: Session = None):
         self.db = db
+        # Listings, search and facets may read from a replica, lookups feeding orders use the primary
+        self.read_db = read_db if read_db is not None else db
+        self.cache = cache
+        self.search_index = search_index
 
     def get_product_by_id(self, product_id: int) -> ProductResponse:
         """
-        Get a single product by ID
+        Get a single product by ID, served from the catalog cache when possible
         """
+        cached = self.cache.get_product(product_id)
+        if cached is not None:
+            return cached
+
+        version = self.cache.version
         product = self.db.query(Product).filter(Product.id == product_id).first()
         if not product:
             raise ValueError(f"Product with ID {product_id} not found")
 
-        return ProductResponse(
-            id=product.id,
-            title=product.title,
-            description=product.description,
-            price=product.price,
-            location=product.location
-        )
+        product_response = to_product_response(product)
+        self.cache.set_product(product_id, product_response, version)
+        return product_response
+
 
+    def count_products(self, location: str = None) -> int:
+        """
+        Count products for a location filter, using the maintained per-location count cache
+        """
+        cached = self.cache.get_count(location)
+        if cached is not None:
+            return cached
+
+        version = self.cache.version
+        count_query = self.read_db.query(Product)
+        if location:
+            count_query = count_query.filter(Product.location == location)
+
+        total_count = count_query.count()
+        self.cache.set_count(location, total_count, version)
+        return total_count
 
-    def get_products(self, page: int = 1, size: int = 10, location: str = None) -> PaginatedResponse[ProductResponse]:
+    def get_products(self, page: int = 1, size: int = 10, location: str = None,
+                     include_total: bool = True) -> PaginatedResponse[ProductResponse]:
         """
-        Get paginated list of products
+        Get paginated list of products.
+        With include_total=False the exact total is skipped and has_next comes from fetching size+1 rows.
         """
+        location = location.strip() if location and location.strip() else None
+
+        cache_key = (page, size, location, include_total)
+        cached = self.cache.get_page(cache_key)
+        if cached is not None:
+            return cached
+
+        version = self.cache.version
+
         # Calculate offset (page starts from 1)
         offset = (page - 1) * size
 
         # Base query
-        query = self.db.query(Product)
+        query = self.read_db.query(Product)
 
         # Apply location filter if provided and not empty
-        if location and location.strip():
-            query = query.filter(Product.location == location.strip())
+        if location:
+            query = query.filter(Product.location == location)
 
-        # Get products with pagination
+        # Get products with pagination, plus one extra row to detect a next page
         products = (query
+                    .order_by(Product.id)
                     .offset(offset)
-                    .limit(size)
+                    .limit(size + 1)
                     .all())
-
-        # Get total count with same filter
-        count_query = self.db.query(Product)
-        if location and location.strip():
-            count_query = count_query.filter(Product.location == location.strip())
-
-        total_count = count_query.count()
+        has_next = len(products) > size
+        products = products[:size]
 
         # Calculate pagination info
-        total_pages = (total_count + size - 1) // size
-        has_next = page < total_pages
+        total_count = None
+        total_pages = None
+        if include_total:
+            total_count = self.count_products(location)
+            total_pages = (total_count + size - 1) // size
         has_previous = page > 1
 
         # Convert to response format
-        product_responses = [
-            ProductResponse(
-                id=product.id,
-                title=product.title,
-                description=product.description,
-                price=product.price,
-                location=product.location
-            )
-            for product in products
-        ]
+        product_responses = [to_product_response(product) for product in products]
+        for product_response in product_responses:
+            self.cache.set_product(product_response.id, product_response, version)
 
-        return PaginatedResponse[ProductResponse](
+        result = PaginatedResponse[ProductResponse](
             content=product_responses,
             total=total_count,
             page=page,
@@ -78,3 +125,235 @@ class ProductService:
             has_next=has_next,
             has_previous=has_previous
         )
+        self.cache.set_page(cache_key, result, version)
+        return result
+
+    def get_products_after(self, cursor: str = None, size: int = 10, location: str = None,
+                           include_total: bool = True) -> PaginatedResponse[ProductResponse]:
+        """
+        Get a page of products using keyset pagination.
+
+        Pages are ordered by (id), or by (location, id) when filtering by location,
+        and seek past the last row of the previous page instead of using OFFSET.
+        """
+        location = location.strip() if location and location.strip() else None
+
+        last_id = 0
+        page = 1
+        if cursor:
+            position = decode_cursor(cursor)
+            if position.get("location") != location:
+                raise ValueError("Pagination cursor does not match the location filter")
+            try:
+                last_id = int(position["id"])
+                page = int(position.get("page", 1))
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Invalid pagination cursor")
+
+        cache_key = ("cursor", last_id, size, location, include_total)
+        cached = self.cache.get_page(cache_key)
+        if cached is not None:
+            return cached
+
+        version = self.cache.version
+
+        query = self.read_db.query(Product)
+        if location:
+            query = query.filter(Product.location == location).order_by(Product.location, Product.id)
+        else:
+            query = query.order_by(Product.id)
+
+        # Fetch one extra row to know whether another page follows
+        products = query.filter(Product.id > last_id).limit(size + 1).all()
+        has_next = len(products) > size
+        products = products[:size]
+
+        total_count = None
+        total_pages = None
+        if include_total:
+            total_count = self.count_products(location)
+            total_pages = (total_count + size - 1) // size
+
+        next_cursor = None
+        if has_next:
+            next_cursor = encode_cursor({"location": location, "id": products[-1].id, "page": page + 1})
+
+        product_responses = [to_product_response(product) for product in products]
+        for product_response in product_responses:
+            self.cache.set_product(product_response.id, product_response, version)
+
+        result = PaginatedResponse[ProductResponse](
+            content=product_responses,
+            total=total_count,
+            page=page,
+            size=size,
+            total_pages=total_pages,
+            has_next=has_next,
+            has_previous=page > 1,
+            next_cursor=next_cursor
+        )
+        self.cache.set_page(cache_key, result, version)
+        return result
+
+    def search_products(self, q: str, page: int = 1, size: int = 10,
+                        location: str = None) -> PaginatedResponse[ProductResponse]:
+        """
+        Full-text search over product titles and descriptions, ranked by relevance
+        """
+        if not q or not q.strip():
+            raise ValueError("Search query must not be empty")
+        location = location.strip() if location and location.strip() else None
+
+        self._sync_search_index()
+        matches = self.search_index.search(q, location)
+
+        total_count = len(matches)
+        offset = (page - 1) * size
+        page_ids = [product_id for product_id, _ in matches[offset:offset + size]]
+
+        products = self._fetch_products(page_ids)
+        total_pages = (total_count + size - 1) // size
+
+        return PaginatedResponse[ProductResponse](
+            content=[products[product_id] for product_id in page_ids if product_id in products],
+            total=total_count,
+            page=page,
+            size=size,
+            total_pages=total_pages,
+            has_next=page < total_pages,
+            has_previous=page > 1
+        )
+
+    def _sync_search_index(self) -> None:
+        """Rebuild the search index if the catalog changed, or re-index just the dirty products"""
+        columns = (Product.id, Product.title, Product.description, Product.location)
+        if self.search_index.is_stale:
+            generation = self.search_index.generation
+            rows = self.db.execute(select(*columns).execution_options(yield_per=1000))
+            self.search_index.rebuild((tuple(row) for row in rows), generation)
+            return
+
+        dirty_ids = self.search_index.dirty_ids()
+        if dirty_ids:
+            rows = self.db.execute(select(*columns).where(Product.id.in_(dirty_ids)))
+            self.search_index.refresh(dirty_ids, [tuple(row) for row in rows])
+
+    def get_products_by_ids(self, product_ids: list) -> ProductBatchResponse:
+        """
+        Get several products at once, in request order, with one IN query for the ones not cached
+        """
+        # De-duplicate while keeping the requested order
+        product_ids = list(dict.fromkeys(product_ids))
+        products = self._fetch_products(product_ids)
+
+        return ProductBatchResponse(
+            content=[products[product_id] for product_id in product_ids if product_id in products],
+            missing_ids=[product_id for product_id in product_ids if product_id not in products]
+        )
+
+    def _fetch_products(self, product_ids: list) -> dict:
+        """Resolve products by ID from the cache, loading the rest with one IN query"""
+        products = {}
+        missing = []
+        for product_id in product_ids:
+            cached = self.cache.get_product(product_id)
+            if cached is not None:
+                products[product_id] = cached
+            else:
+                missing.append(product_id)
+
+        if missing:
+            version = self.cache.version
+            for product in self.db.query(Product).filter(Product.id.in_(missing)).all():
+                product_response = to_product_response(product)
+                self.cache.set_product(product.id, product_response, version)
+                products[product.id] = product_response
+        return products
+
+    def get_facets(self, bucket_size: float = settings.PRODUCT_FACET_PRICE_BUCKET_SIZE) -> ProductFacetsResponse:
+        """
+        Per-location counts, price stats and price histograms.
+
+        Served from a summary kept in the catalog cache for at most CATALOG_CACHE_TTL_SECONDS.
+        After a catalog change or expiry it is recomputed with a single GROUP BY
+        (location, price bucket) pass.
+        """
+        cached = self.cache.get_facets(bucket_size)
+        if cached is not None:
+            return cached
+
+        version = self.cache.version
+        if self.read_db.get_bind().dialect.name == "sqlite":
+            # SQLite has no FLOOR without the math extension; prices are never negative
+            bucket = cast(Product.price / bucket_size, Integer)
+        else:
+            bucket = cast(func.floor(Product.price / bucket_size), Integer)
+
+        groups = self.read_db.execute(
+            select(
+                Product.location,
+                bucket.label("bucket"),
+                func.count(Product.id),
+                func.count(Product.price),
+                func.min(Product.price),
+                func.max(Product.price),
+                func.sum(Product.price)
+            ).group_by(Product.location, bucket)
+        ).all()
+
+        facets = self._build_facets(groups, bucket_size)
+        self.cache.set_facets(bucket_size, facets, version)
+        return facets
+
+    @staticmethod
+    def _build_facets(groups, bucket_size: float) -> ProductFacetsResponse:
+        """Fold (location, bucket) group aggregates into per-location and catalog-wide facets"""
+
+        def new_stats():
+            return {"count": 0, "priced": 0, "min": None, "max": None, "sum": 0.0, "buckets": {}}
+
+        def merge(stats, bucket, count, priced, min_price, max_price, price_sum):
+            stats["count"] += count
+            if not priced:
+                return
+            stats["priced"] += priced
+            stats["sum"] += price_sum
+            stats["min"] = min_price if stats["min"] is None else min(stats["min"], min_price)
+            stats["max"] = max_price if stats["max"] is None else max(stats["max"], max_price)
+            stats["buckets"][bucket] = stats["buckets"].get(bucket, 0) + priced
+
+        def histogram(stats):
+            return [
+                PriceBucket(min_price=bucket * bucket_size, max_price=(bucket + 1) * bucket_size, count=count)
+                for bucket, count in sorted(stats["buckets"].items())
+            ]
+
+        def average(stats):
+            return round(stats["sum"] / stats["priced"], 2) if stats["priced"] else None
+
+        overall = new_stats()
+        per_location = {}
+        for location, bucket, count, priced, min_price, max_price, price_sum in groups:
+            row = (bucket, count, priced, min_price, max_price, price_sum)
+            merge(overall, *row)
+            merge(per_location.setdefault(location, new_stats()), *row)
+
+        return ProductFacetsResponse(
+            total=overall["count"],
+            min_price=overall["min"],
+            max_price=overall["max"],
+            avg_price=average(overall),
+            bucket_size=bucket_size,
+            locations=[
+                LocationFacet(
+                    location=location,
+                    count=stats["count"],
+                    min_price=stats["min"],
+                    max_price=stats["max"],
+                    avg_price=average(stats),
+                    price_buckets=histogram(stats)
+                )
+                for location, stats in sorted(per_location.items(), key=lambda item: item[0] or "")
+            ],
+            price_buckets=histogram(overall)
+        )
@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+
+# Point the app at a throwaway SQLite database before any module creates its engine
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ.pop("READ_DATABASE_URL", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uuid
+
+import pytest
+
+from database import SessionLocal, engine
+from modles.users_models import User
+from utils.db_schema import ensure_schema
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    ensure_schema(engine)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    name = f"user-{uuid.uuid4().hex[:12]}"
+    user = User(username=name, email=f"{name}@example.com", hashed_password="x", registered_on="2025-01-01")
+    db.add(user)
+    db.commit()
+    return user
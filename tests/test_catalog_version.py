@@ -0,0 +1,71 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from modles.order_models import Order, PaymentRequest
+from modles.product_models import Product
+from schemas.orders_schemas import CheckoutRequest
+from services.catalog_version_service import CatalogVersionService, catalog_version_tracker
+from services.order_service import OrderService
+from services.products_service import ProductService
+
+AUTH = {"Authorization": "Bearer test"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Re-read the shared version on every request
+    monkeypatch.setattr(catalog_version_tracker, "check_seconds", 0)
+    return TestClient(app)
+
+
+def import_from_another_process(db, **product) -> int:
+    """Write a product and bump the shared version without touching this process' caches"""
+    row = Product(description="", location="JO", **product)
+    db.add(row)
+    db.flush()
+    CatalogVersionService(db).bump()
+    db.commit()
+    return row.id
+
+
+def test_search_sees_products_imported_by_another_process(db, client):
+    assert client.get("/products/search?q=zephyrblade", headers=AUTH).json()["data"]["total"] == 0
+
+    product_id = import_from_another_process(db, title="Zephyrblade", price=75.0)
+
+    results = client.get("/products/search?q=zephyrblade", headers=AUTH).json()["data"]
+    assert [product["id"] for product in results["content"]] == [product_id]
+
+
+def test_product_etag_is_weak_and_revalidates(db, client):
+    product_id = import_from_another_process(db, title="Quillhaven", price=12.0)
+
+    response = client.get(f"/products/{product_id}", headers=AUTH)
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    assert client.get(f"/products/{product_id}", headers={**AUTH, "If-None-Match": etag}).status_code == 304
+    # If-None-Match uses the weak comparison, a client dropping the W/ prefix still matches
+    assert client.get(f"/products/{product_id}", headers={**AUTH, "If-None-Match": etag[2:]}).status_code == 304
+
+
+def test_checkout_prices_from_the_primary_not_the_catalog_cache(db, user):
+    first_id = import_from_another_process(db, title="Emberlance", price=10.0)
+    second_id = import_from_another_process(db, title="Frostmail", price=20.0)
+    # Warm this process' catalog cache with the old prices
+    ProductService(db).get_products_by_ids([first_id, second_id])
+
+    db.query(Product).filter(Product.id.in_([first_id, second_id])).update({Product.price: Product.price * 2})
+    CatalogVersionService(db).bump()
+    db.commit()
+
+    result = OrderService(db).checkout(CheckoutRequest(items=[
+        {"product_id": first_id, "quantity": 1},
+        {"product_id": second_id, "quantity": 2}
+    ]), user)
+
+    assert result.total_price == 100.0
+    assert [order.unit_price for order in db.query(Order).filter(Order.id.in_(result.order_ids))] == [20.0, 40.0]
+    payment_id = int(result.payment_url.rsplit("/", 1)[1])
+    assert db.get(PaymentRequest, payment_id).price == 100.0
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from modles.order_models import Order, PaymentRequest
+from modles.product_models import Product
+from schemas.orders_schemas import PaymentCallback
+from services.order_expiry_service import OrderExpiryService
+from services.order_service import OrderService
+
+
+def add_stale_order(db, user, payment_status: str) -> tuple:
+    product = Product(title="Shield", description="", price=20.0, location="SA")
+    db.add(product)
+    db.flush()
+    order = Order(user_id=user.id, product_id=product.id, quantity=1, price=20.0, status="INITIATED",
+                  created_at=datetime.now() - timedelta(days=1))
+    db.add(order)
+    db.flush()
+    payment = PaymentRequest(reference_id=str(order.id), price=20.0, status=payment_status,
+                             redirect_url="http://localhost/redirect", callback_url="http://localhost/callback")
+    db.add(payment)
+    db.commit()
+    return payment.payment_id, order.id
+
+
+def test_sweeper_leaves_payments_being_charged_alone(db, user):
+    processing_payment, processing_order = add_stale_order(db, user, "PROCESSING")
+    new_payment, new_order = add_stale_order(db, user, "NEW")
+
+    OrderExpiryService(db).expire_stale_orders(ttl_seconds=60, batch_size=10)
+
+    db.expire_all()
+    assert db.get(PaymentRequest, new_payment).status == "EXPIRED"
+    assert db.get(Order, new_order).status == "EXPIRED"
+    assert db.get(PaymentRequest, processing_payment).status == "PROCESSING"
+    assert db.get(Order, processing_order).status == "INITIATED"
+
+
+def test_gateway_callback_settles_a_payment_being_charged(db, user):
+    payment_id, order_id = add_stale_order(db, user, "PROCESSING")
+
+    OrderService.mock_payment_callback(
+        PaymentCallback(trx_number="GW1", reference_id=order_id, status="CAPTURED", payment_id=payment_id), db
+    )
+
+    db.expire_all()
+    assert db.get(PaymentRequest, payment_id).status == "CAPTURED"
+    assert db.get(Order, order_id).status == "SUCCESS"
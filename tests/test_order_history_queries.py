@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from database import engine
+from modles.order_models import Order
+from modles.product_models import Product
+from services.order_service import OrderService
+from services.products_service import ProductService
+from utils.catalog_cache import CatalogCache
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def add_orders(db, user, count: int) -> None:
+    """Orders for distinct products, half of them placed before product snapshots existed"""
+    products = [Product(title=f"Item {i}", description="", price=10.0 + i, location="JO") for i in range(count)]
+    db.add_all(products)
+    db.flush()
+
+    created_at = datetime(2025, 1, 1)
+    for i, product in enumerate(products):
+        snapshot = {}
+        if i % 2:
+            snapshot = dict(product_title=product.title, product_description=product.description,
+                            product_location=product.location, unit_price=product.price)
+        db.add(Order(user_id=user.id, product_id=product.id, quantity=1, price=product.price,
+                     status="INITIATED", created_at=created_at + timedelta(minutes=i), **snapshot))
+    db.commit()
+
+
+def fetch_page_statements(db, user, size: int) -> list:
+    db.refresh(user)
+    # A fresh catalog cache so every product has to come from the database
+    product_service = ProductService(db, cache=CatalogCache(max_size=1024, ttl_seconds=300))
+    with count_statements() as statements:
+        page = OrderService(db).get_orders(user, product_service, page=1, size=size)
+    assert len(page.content) == size
+    return statements
+
+
+def test_order_history_query_count_does_not_grow_with_page_size(db, user):
+    add_orders(db, user, 60)
+
+    small_page = fetch_page_statements(db, user, 4)
+    large_page = fetch_page_statements(db, user, 60)
+
+    # Orders, total count and one batched product lookup
+    assert len(small_page) == len(large_page) == 3
+
+
+def test_cursor_page_query_count_does_not_grow_with_page_size(db, user):
+    add_orders(db, user, 60)
+    product_service = ProductService(db, cache=CatalogCache(max_size=1024, ttl_seconds=300))
+
+    counts = []
+    for size in (4, 60):
+        product_service.cache = CatalogCache(max_size=1024, ttl_seconds=300)
+        db.refresh(user)
+        with count_statements() as statements:
+            page = OrderService(db).get_orders_after(user, product_service, size=size, include_total=False)
+        assert len(page.content) == size
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1] == 2
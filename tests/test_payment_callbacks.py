@@ -0,0 +1,92 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config.setting import settings
+from main import app
+from modles.order_models import Order, PaymentRequest
+from modles.product_models import Product
+from schemas.orders_schemas import CheckoutRequest
+from services.order_service import OrderService
+from utils.security import sign_payload
+
+SECRET = "test-callback-secret"
+
+
+@pytest.fixture
+def payment(db, user):
+    product = Product(title="Bow", description="", price=30.0, location="JO")
+    db.add(product)
+    db.flush()
+    order = Order(user_id=user.id, product_id=product.id, quantity=1, price=30.0, status="INITIATED")
+    db.add(order)
+    db.flush()
+    payment = PaymentRequest(reference_id=str(order.id), price=30.0, status="NEW",
+                             redirect_url="http://localhost/redirect", callback_url="http://localhost/callback")
+    db.add(payment)
+    db.commit()
+    return payment.payment_id, order.id
+
+
+def post_batch(payment, headers=None):
+    payment_id, order_id = payment
+    callback = {"reference_id": order_id, "trx_number": "T1", "status": "CAPTURED"}
+    if payment_id is not None:
+        callback["payment_id"] = payment_id
+    body = json.dumps({"callbacks": [callback]}).encode("utf-8")
+    headers = {"Content-Type": "application/json", **(headers(body) if headers else {})}
+    return TestClient(app).post("/payment/callbacks/batch", content=body, headers=headers)
+
+
+@pytest.mark.parametrize("headers", [
+    None,
+    lambda body: {"X-Signature": sign_payload("wrong-secret", body)},
+    lambda body: {"X-Signature": sign_payload(SECRET, body + b" ")},
+])
+def test_unsigned_batches_are_rejected_before_anything_is_applied(db, payment, monkeypatch, headers):
+    monkeypatch.setattr(settings, "PAYMENT_CALLBACK_SECRET", SECRET)
+
+    assert post_batch(payment, headers).status_code == 401
+
+    db.expire_all()
+    assert db.get(PaymentRequest, payment[0]).status == "NEW"
+    assert db.get(Order, payment[1]).status == "INITIATED"
+
+
+def test_callbacks_are_refused_without_a_configured_secret(db, payment, monkeypatch):
+    monkeypatch.setattr(settings, "PAYMENT_CALLBACK_SECRET", None)
+
+    response = post_batch(payment, lambda body: {"X-Signature": sign_payload(SECRET, body)})
+    assert response.status_code == 503
+
+
+def test_signed_batch_is_applied(db, payment, monkeypatch):
+    monkeypatch.setattr(settings, "PAYMENT_CALLBACK_SECRET", SECRET)
+
+    response = post_batch(payment, lambda body: {"X-Signature": sign_payload(SECRET, body)})
+    assert response.status_code == 200
+    assert response.json()["data"]["applied"] == 1
+
+    db.expire_all()
+    assert db.get(PaymentRequest, payment[0]).status == "CAPTURED"
+    assert db.get(Order, payment[1]).status == "SUCCESS"
+
+
+def test_reference_only_callback_settles_every_checkout_line(db, user, monkeypatch):
+    monkeypatch.setattr(settings, "PAYMENT_CALLBACK_SECRET", SECRET)
+    products = [Product(title=title, description="", price=10.0, location="JO") for title in ("Axe", "Shield")]
+    db.add_all(products)
+    db.commit()
+    checkout = OrderService(db).checkout(CheckoutRequest(items=[
+        {"product_id": product.id, "quantity": 1} for product in products
+    ]), user)
+    payment_id = int(checkout.payment_url.rsplit("/", 1)[1])
+
+    # The gateway only echoes the reference_id, which is the first line's order id
+    response = post_batch((None, checkout.order_ids[0]), lambda body: {"X-Signature": sign_payload(SECRET, body)})
+    assert response.json()["data"]["results"][0]["orders_settled"] == 2
+
+    db.expire_all()
+    assert db.get(PaymentRequest, payment_id).status == "CAPTURED"
+    assert [db.get(Order, order_id).status for order_id in checkout.order_ids] == ["SUCCESS", "SUCCESS"]
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from dependencies import get_payment_gateway
+from database import SessionLocal
+from main import app
+from modles.order_models import Order, PaymentRequest
+from modles.product_models import Product
+from schemas.orders_schemas import ProcessPayment
+from schemas.orders_schemas import PaymentCallback
+from services.order_expiry_service import OrderExpiryService
+from services.order_service import OrderService
+from services.payment_gateway import (
+    ChargeResult, CircuitBreaker, HttpPaymentGateway, PaymentGateway, PaymentGatewayError
+)
+from services.payment_queue_service import PaymentQueue, PaymentQueueFull
+
+
+class CountingGateway(PaymentGateway):
+    """Approves every charge after a delay, so concurrent attempts overlap, and counts them"""
+
+    def __init__(self, delay_seconds: float = 0.3, error: Exception = None):
+        self.delay_seconds = delay_seconds
+        self.error = error
+        self.charges = 0
+        self._lock = threading.Lock()
+
+    async def charge(self, payment_id: int, amount: float, request) -> ChargeResult:
+        with self._lock:
+            self.charges += 1
+        await asyncio.sleep(self.delay_seconds)
+        if self.error is not None:
+            raise self.error
+        return ChargeResult(approved=True, transaction_reference=f"TRX{payment_id}")
+
+
+@pytest.fixture
+def payment(db, user):
+    product = Product(title="Sword", description="", price=50.0, location="JO")
+    db.add(product)
+    db.flush()
+    order = Order(user_id=user.id, product_id=product.id, quantity=1, price=50.0, status="INITIATED")
+    db.add(order)
+    db.flush()
+    payment = PaymentRequest(reference_id=str(order.id), price=50.0, status="NEW",
+                             redirect_url="http://localhost/redirect", callback_url="http://localhost/callback")
+    db.add(payment)
+    db.commit()
+    return payment.payment_id, order.id
+
+
+@pytest.fixture
+def client():
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+CARD = {"card_number": "4111111111111111", "cvv": "123", "expiry_date": "12/30"}
+
+
+def process(client, payment_id: int) -> dict:
+    return client.post("/payment/process", json={"payment_id": payment_id, **CARD}).json()
+
+
+def test_parallel_attempts_charge_and_settle_once(db, client, payment):
+    payment_id, order_id = payment
+    gateway = CountingGateway()
+    app.dependency_overrides[get_payment_gateway] = lambda: gateway
+
+    start = threading.Barrier(2)
+    responses = []
+
+    def attempt():
+        start.wait()
+        responses.append(process(client, payment_id))
+
+    threads = [threading.Thread(target=attempt) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    captured = [response for response in responses if response["data"] and response["data"]["status"] == "CAPTURED"]
+    rejected = [response for response in responses if response["status"] == "error"]
+    assert len(captured) == 1
+    assert len(rejected) == 1
+    assert "already processed" in rejected[0]["errors"][0]
+    assert gateway.charges == 1
+
+    db.expire_all()
+    assert db.get(PaymentRequest, payment_id).status == "CAPTURED"
+    assert db.get(Order, order_id).status == "SUCCESS"
+
+
+def test_definite_non_charge_releases_the_claim(db, client, payment):
+    payment_id, order_id = payment
+    app.dependency_overrides[get_payment_gateway] = lambda: CountingGateway(
+        0, PaymentGatewayError("circuit open", not_charged=True))
+
+    response = process(client, payment_id)
+    assert response["status"] == "error"
+    db.expire_all()
+    assert db.get(PaymentRequest, payment_id).status == "NEW"
+
+    app.dependency_overrides[get_payment_gateway] = lambda: CountingGateway(0)
+    assert process(client, payment_id)["data"]["status"] == "CAPTURED"
+    db.expire_all()
+    assert db.get(Order, order_id).status == "SUCCESS"
+
+
+def test_timeout_after_charging_keeps_the_claim_for_the_callback(db, client, payment):
+    payment_id, order_id = payment
+    charged = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        # The gateway charges the card, then the answer never arrives
+        charged.append(request)
+        raise httpx.ReadTimeout("no answer")
+
+    gateway = HttpPaymentGateway(base_url="http://gateway.test", max_retries=0,
+                                 breaker=CircuitBreaker(failure_threshold=5),
+                                 transport=httpx.MockTransport(handler))
+    asyncio.run(gateway.start())
+    app.dependency_overrides[get_payment_gateway] = lambda: gateway
+
+    assert process(client, payment_id)["status"] == "error"
+    assert len(charged) == 1
+    db.expire_all()
+    assert db.get(PaymentRequest, payment_id).status == "PROCESSING"
+
+    # Not charged again, not expired, and the gateway's callback still settles it
+    assert "already processed" in process(client, payment_id)["errors"][0]
+    OrderExpiryService(db).expire_stale_orders(ttl_seconds=0, batch_size=10)
+    OrderService.mock_payment_callback(
+        PaymentCallback(trx_number="GW1", reference_id=order_id, status="CAPTURED", payment_id=payment_id), db
+    )
+    db.expire_all()
+    assert len(charged) == 1
+    assert db.get(PaymentRequest, payment_id).status == "CAPTURED"
+    assert db.get(Order, order_id).status == "SUCCESS"
+
+
+def test_queue_stop_lets_the_payment_in_flight_finish(db, payment):
+    payment_id, order_id = payment
+
+    async def scenario():
+        queue = PaymentQueue(SessionLocal, CountingGateway(0.3), workers=2)
+        queue.start()
+        job = queue.submit(ProcessPayment(payment_id=payment_id, **CARD))
+        await asyncio.sleep(0.1)
+        await queue.stop()
+        with pytest.raises(PaymentQueueFull):
+            queue.submit(ProcessPayment(payment_id=payment_id, **CARD))
+        return queue.get_job(job.job_id)
+
+    job = asyncio.run(scenario())
+    assert job.status == "COMPLETED"
+    db.expire_all()
+    assert db.get(PaymentRequest, payment_id).status == "CAPTURED"
+    assert db.get(Order, order_id).status == "SUCCESS"
@@ -0,0 +1,19 @@
+import asyncio
+
+from utils.payment_events import DatabasePollingPaymentEventBroker, payment_event
+
+
+def test_polling_broker_only_remembers_watched_payments():
+    broker = DatabasePollingPaymentEventBroker(session_factory=None)
+
+    async def scenario():
+        queue = broker.subscribe(1)
+        broker.publish(1, payment_event(1, "PROCESSING"))
+        broker.publish(2, payment_event(2, "CAPTURED"))
+        assert broker.stats()["tracked_statuses"] == 1
+
+        broker.unsubscribe(1, queue)
+        assert broker._prune_statuses() == set()
+        assert broker.stats()["tracked_statuses"] == 0
+
+    asyncio.run(scenario())
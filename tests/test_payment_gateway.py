@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+import pytest
+
+from schemas.orders_schemas import ProcessPayment
+from services.payment_gateway import CircuitBreaker, HttpPaymentGateway, PaymentGatewayError
+
+REQUEST = ProcessPayment(payment_id=1, card_number="4111111111111111", cvv="123", expiry_date="12/30")
+
+
+def make_gateway(handler) -> HttpPaymentGateway:
+    return HttpPaymentGateway(base_url="http://gateway.test", max_retries=0,
+                              breaker=CircuitBreaker(failure_threshold=1, reset_seconds=0),
+                              transport=httpx.MockTransport(handler))
+
+
+def test_cancelled_half_open_trial_does_not_wedge_the_breaker():
+    mode = {"answer": "fail"}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if mode["answer"] == "hang":
+            await asyncio.sleep(60)
+        if mode["answer"] == "fail":
+            return httpx.Response(503)
+        return httpx.Response(200, json={"status": "APPROVED", "transaction_reference": "TRX1"})
+
+    async def scenario():
+        gateway = make_gateway(handler)
+        await gateway.start()
+        try:
+            # One failure opens the breaker, with reset_seconds=0 the next call is the half-open trial
+            try:
+                await gateway.charge(1, 10.0, REQUEST)
+            except PaymentGatewayError:
+                pass
+            assert gateway.breaker.state == "half_open"
+
+            mode["answer"] = "hang"
+            trial = asyncio.create_task(gateway.charge(1, 10.0, REQUEST))
+            await asyncio.sleep(0.05)
+            trial.cancel()
+            try:
+                await trial
+            except asyncio.CancelledError:
+                pass
+
+            mode["answer"] = "ok"
+            charge = await gateway.charge(1, 10.0, REQUEST)
+            assert charge.approved
+            assert gateway.breaker.state == "closed"
+        finally:
+            await gateway.close()
+
+    asyncio.run(scenario())
+
+
+
+@pytest.mark.parametrize("failure, not_charged", [
+    (httpx.ConnectError("refused"), True),
+    (httpx.Response(402, text="card declined"), True),
+    (httpx.ReadTimeout("no answer"), False),
+    (httpx.Response(502), False),
+])
+def test_errors_only_report_definite_non_charges(failure, not_charged):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if isinstance(failure, Exception):
+            raise failure
+        return failure
+
+    async def scenario():
+        # The failed first attempt opens the breaker, so the retry is refused by the open circuit,
+        # which must not hide that the first attempt may have charged
+        gateway = HttpPaymentGateway(base_url="http://gateway.test", max_retries=1, backoff_seconds=0,
+                                     breaker=CircuitBreaker(failure_threshold=1, reset_seconds=60),
+                                     transport=httpx.MockTransport(handler))
+        await gateway.start()
+        try:
+            with pytest.raises(PaymentGatewayError) as error:
+                await gateway.charge(1, 10.0, REQUEST)
+            assert error.value.not_charged is not_charged
+        finally:
+            await gateway.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,112 @@
+import threading
+from typing import Callable, List, Optional
+
+from config.setting import settings
+from utils.lru_cache import LRUCache
+
+
+class CatalogCache:
+    """
+    In-process read-through cache for the product catalog.
+
+    Holds single products by ID, whole listing pages, their pre-serialized JSON
+    and the catalog facets summary. Every write to the products table must go
+    through invalidate_product / invalidate_all, which also bump the catalog
+    version and notify registered listeners.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.products = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.pages = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.counts = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.responses = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.facets = LRUCache(max_size=16, ttl_seconds=ttl_seconds)
+        self.version = 0
+        self._listeners: List[Callable[[Optional[int]], None]] = []
+        self._lock = threading.Lock()
+
+    def get_product(self, product_id: int):
+        return self.products.get(product_id)
+
+    def set_product(self, product_id: int, product, version: Optional[int] = None) -> None:
+        # Skip results read before an invalidation that happened mid-request
+        if version is None or version == self.version:
+            self.products.set(product_id, product)
+
+    def get_page(self, key: tuple):
+        return self.pages.get(key)
+
+    def set_page(self, key: tuple, page, version: Optional[int] = None) -> None:
+        if version is None or version == self.version:
+            self.pages.set(key, page)
+
+    def get_count(self, location: Optional[str]) -> Optional[int]:
+        return self.counts.get(location)
+
+    def set_count(self, location: Optional[str], count: int, version: Optional[int] = None) -> None:
+        if version is None or version == self.version:
+            self.counts.set(location, count)
+
+    def get_response(self, key: str):
+        return self.responses.get(key)
+
+    def set_response(self, key: str, encoded, version: Optional[int] = None) -> None:
+        if version is None or version == self.version:
+            self.responses.set(key, encoded)
+
+    def get_facets(self, bucket_size: float):
+        return self.facets.get(bucket_size)
+
+    def set_facets(self, bucket_size: float, facets, version: Optional[int] = None) -> None:
+        if version is None or version == self.version:
+            self.facets.set(bucket_size, facets)
+
+    def add_invalidation_listener(self, listener: Callable[[Optional[int]], None]) -> None:
+        """
+        Register a callback run after every invalidation.
+        It receives the product ID, or None when the whole catalog was invalidated.
+        """
+        self._listeners.append(listener)
+
+    def invalidate_product(self, product_id: int) -> None:
+        """Drop a single product and every cached page that may contain it"""
+        self.products.delete(product_id)
+        self.pages.clear()
+        self.counts.clear()
+        self.responses.clear()
+        self.facets.clear()
+        self._bump_version(product_id)
+
+    def invalidate_all(self) -> None:
+        """Drop everything, e.g. after a bulk catalog import"""
+        self.products.clear()
+        self.pages.clear()
+        self.counts.clear()
+        self.responses.clear()
+        self.facets.clear()
+        self._bump_version(None)
+
+    def _bump_version(self, product_id: Optional[int]) -> None:
+        with self._lock:
+            self.version += 1
+        for listener in self._listeners:
+            try:
+                listener(product_id)
+            except Exception as e:
+                print(f"Catalog invalidation listener failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "products": self.products.stats(),
+            "pages": self.pages.stats(),
+            "counts": self.counts.stats(),
+            "responses": self.responses.stats(),
+            "facets": self.facets.stats()
+        }
+
+
+catalog_cache = CatalogCache(
+    max_size=settings.CATALOG_CACHE_MAX_SIZE,
+    ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS
+)
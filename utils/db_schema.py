@@ -0,0 +1,153 @@
+import argparse
+import re
+from typing import Callable, Dict, List
+
+from sqlalchemy import String, Table, and_, cast, func, inspect, or_, select, text, tuple_
+from sqlalchemy.engine import Engine
+
+from database import Base, engine
+from modles.audit_models import AuditTrail
+from modles.catalog_models import CatalogImport
+from modles.idempotency_models import IdempotencyRecord
+from modles.order_models import Order, PaymentRequest
+from modles.product_models import Product
+from modles.users_models import User
+
+# Representative statements for the hot service queries, used for the index usage report
+HOT_QUERIES: Dict[str, Callable] = {
+    "ProductService.get_products (location)": lambda: (
+        select(Product).where(Product.location == "JO").order_by(Product.id).limit(10)
+    ),
+    "ProductService.get_products_after (location)": lambda: (
+        select(Product).where(Product.location == "JO", Product.id > 10)
+        .order_by(Product.location, Product.id).limit(10)
+    ),
+    "ProductService.count_products (location)": lambda: (
+        select(func.count()).select_from(Product).where(Product.location == "JO")
+    ),
+    "OrderService.get_orders": lambda: (
+        select(Order).where(Order.user_id == 1).order_by(Order.created_at.desc(), Order.id.desc()).limit(10)
+    ),
+    "OrderService.get_orders_after": lambda: (
+        select(Order).where(Order.user_id == 1, tuple_(Order.created_at, Order.id) < ("2025-01-01 00:00:00", 10))
+        .order_by(Order.created_at.desc(), Order.id.desc()).limit(10)
+    ),
+    "OrderService.get_orders (count)": lambda: (
+        select(func.count()).select_from(Order).where(Order.user_id == 1)
+    ),
+    "OrderExpiryService.expire_batch": lambda: (
+        select(PaymentRequest.payment_id)
+        .join(Order, or_(PaymentRequest.payment_id == Order.payment_id,
+                         and_(Order.payment_id.is_(None), PaymentRequest.reference_id == cast(Order.id, String))))
+        .where(Order.status == "INITIATED", Order.created_at < "2025-01-01 00:00:00", PaymentRequest.status == "NEW")
+        .order_by(Order.created_at).limit(500)
+    ),
+    "PaymentRequest by reference_id": lambda: (
+        select(PaymentRequest).where(PaymentRequest.reference_id == "1")
+    ),
+    "AuditTrail by creation_date": lambda: (
+        select(AuditTrail).where(AuditTrail.creation_date >= "2025-01-01").limit(100)
+    ),
+    "IdempotencyService lookup": lambda: (
+        select(IdempotencyRecord).where(IdempotencyRecord.scope == "orders.checkout:1", IdempotencyRecord.key == "k")
+    ),
+    "AuthService.login": lambda: (
+        select(User).where(User.email == "john@example.com")
+    ),
+}
+
+# Indexes replaced by a managed index and dropped when still present
+RETIRED_INDEXES: Dict[str, List[str]] = {
+    "order": ["ix_order_user_id_created_at"],
+}
+
+_INDEX_PATTERN = re.compile(r"(?:USING (?:COVERING )?INDEX|(?:Index|Bitmap Index)(?: Only)? Scan using|on) (\w+)")
+
+
+def add_missing_columns(bind: Engine, table: Table, existing_columns: set) -> List[str]:
+    """
+    Add model columns missing from an existing table, either nullable or NOT NULL with a server default.
+    Columns only, constraints such as foreign keys are not retrofitted.
+    """
+    added = []
+    preparer = bind.dialect.identifier_preparer
+    for column in table.columns:
+        if column.name in existing_columns:
+            continue
+        if not column.nullable and column.server_default is None:
+            continue
+        definition = f"{preparer.quote(column.name)} {column.type.compile(dialect=bind.dialect)}"
+        if column.server_default is not None:
+            default = column.server_default.arg
+            definition += f" NOT NULL DEFAULT {default.text if hasattr(default, 'text') else repr(default)}"
+        with bind.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}"))
+        added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def ensure_schema(bind: Engine = engine) -> List[str]:
+    """
+    Create missing tables and nullable columns, then create any managed index missing
+    from an existing table and drop retired ones. Safe to run on every startup.
+    Returns the names of the indexes that were created.
+    """
+    Base.metadata.create_all(bind=bind)
+
+    inspector = inspect(bind)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        added = add_missing_columns(bind, table, {column["name"] for column in inspector.get_columns(table.name)})
+        if added:
+            print(f"Added missing columns: {', '.join(added)}")
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for retired in RETIRED_INDEXES.get(table.name, []):
+            if retired in existing:
+                with bind.begin() as connection:
+                    connection.execute(text(f"DROP INDEX IF EXISTS {retired}"))
+                print(f"Dropped retired index {retired}")
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=bind, checkfirst=True)
+                created.append(index.name)
+
+    if created:
+        print(f"Created missing indexes: {', '.join(created)}")
+    return created
+
+
+def explain_hot_queries(bind: Engine = engine) -> Dict[str, dict]:
+    """
+    Run EXPLAIN for every hot query and report the plan and the indexes it uses
+    """
+    managed_indexes = {index.name for table in Base.metadata.sorted_tables for index in table.indexes}
+    report = {}
+    with bind.connect() as connection:
+        for name, build_query in HOT_QUERIES.items():
+            sql = str(build_query().compile(bind=bind, compile_kwargs={"literal_binds": True}))
+            if bind.dialect.name == "sqlite":
+                plan = [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+            else:
+                plan = [row[0] for row in connection.execute(text(f"EXPLAIN {sql}"))]
+
+            used = sorted({match for line in plan for match in _INDEX_PATTERN.findall(line)
+                           if match in managed_indexes or match.startswith(("ix_", "sqlite_autoindex"))})
+            report[name] = {"indexes": used, "plan": plan}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify database indexes and report hot query plans")
+    parser.add_argument("--report", action="store_true", help="Print the index usage of hot service queries")
+    args = parser.parse_args()
+
+    ensure_schema(engine)
+    if args.report:
+        for name, result in explain_hot_queries(engine).items():
+            print(f"{name}: {', '.join(result['indexes']) or 'NO INDEX (full scan)'}")
+            for line in result["plan"]:
+                print(f"    {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from config.setting import settings
+from schemas.api_response_schemas import encode_success_response
+from utils.catalog_cache import CatalogCache, catalog_cache
+
+
+def catalog_etag(request: Request, catalog_version: str) -> str:
+    """
+    Weak ETag for a catalog read: the shared catalog version plus the request path and query.
+    The version comes from the database, so every process issues the same ETag for the same data.
+    Weak because the bodies only match semantically, each one carries its own timestamp.
+    """
+    query = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    fingerprint = f"{catalog_version}:{request.url.path}?{query}"
+    return 'W/"' + hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _opaque_tag(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def is_not_modified(request: Request, etag: str, exists: bool = True) -> bool:
+    """
+    Check the If-None-Match header against the current ETag with the weak comparison it calls for.
+    `*` only matches when the resource exists, pass exists=False until that is known.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return _opaque_tag(etag) in map(_opaque_tag, candidates) or (exists and "*" in candidates)
+
+
+def cache_headers(etag: str) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.PRODUCT_CACHE_MAX_AGE_SECONDS}"
+    }
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+def cached_json_response(etag: str, catalog_version: str, cache: CatalogCache = catalog_cache) -> Optional[Response]:
+    """
+    Serve a previously encoded success response for this ETag, skipping serialization.
+    Entries encoded under another shared catalog version are never served.
+    """
+    cached = cache.get_response(etag)
+    if cached is None:
+        return None
+    encoded_version, data_json, message = cached
+    if encoded_version != catalog_version:
+        return None
+    return Response(content=encode_success_response(data_json, message),
+                    media_type="application/json", headers=cache_headers(etag))
+
+
+def cache_json_response(etag: str, data: BaseModel, message: str, version: int, catalog_version: str,
+                        cache: CatalogCache = catalog_cache) -> Response:
+    """
+    Encode a success response once, keep the data bytes under its ETag with the shared
+    catalog version it was read at and return it
+    """
+    data_json = data.model_dump_json().encode("utf-8")
+    cache.set_response(etag, (catalog_version, data_json, message), version)
+    return Response(content=encode_success_response(data_json, message),
+                    media_type="application/json", headers=cache_headers(etag))
@@ -0,0 +1,21 @@
+import base64
+import json
+
+
+def encode_cursor(payload: dict) -> str:
+    """Encode a keyset position into an opaque, URL-safe cursor"""
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid pagination cursor")
+    return payload
@@ -0,0 +1,178 @@
+import asyncio
+import threading
+from typing import Callable, Dict, Optional, Set
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from config.setting import settings
+
+_PENDING_KEY = "pending_payment_events"
+
+# Statuses after which a payment never changes again
+FINAL_PAYMENT_STATUSES = ("CAPTURED", "FAILED", "EXPIRED")
+
+
+def payment_event(payment_id: int, status: str, trx_number: Optional[str] = None) -> dict:
+    return {"payment_id": payment_id, "status": status, "trx_number": trx_number}
+
+
+class PaymentEventBroker:
+    """
+    In-process pub/sub of payment status changes keyed by payment id.
+
+    publish() may be called from any thread, events are handed to the
+    subscribers' event loops with call_soon_threadsafe. Only subscribers in
+    the same process see events, see DatabasePollingPaymentEventBroker for
+    multi-worker deployments.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Dict[asyncio.Queue, asyncio.AbstractEventLoop]] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def publish(self, payment_id: int, event_data: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(payment_id, {}).items())
+        self.published += 1
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event_data)
+            except RuntimeError:
+                # The subscriber's loop is already closed
+                pass
+
+    def subscribe(self, payment_id: int) -> asyncio.Queue:
+        """Start receiving the payment's events on a queue of the running event loop"""
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(payment_id, {})[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, payment_id: int, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(payment_id)
+            if subscribers is not None:
+                subscribers.pop(queue, None)
+                if not subscribers:
+                    del self._subscribers[payment_id]
+
+    def subscribed_ids(self) -> Set[int]:
+        with self._lock:
+            return set(self._subscribers)
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscribers = sum(len(queues) for queues in self._subscribers.values())
+        return {"broker": type(self).__name__, "subscribers": subscribers, "published": self.published}
+
+
+class DatabasePollingPaymentEventBroker(PaymentEventBroker):
+    """
+    Broker for several worker processes: one task per process polls the
+    statuses of all payments with local subscribers in a single query and
+    publishes the changes, so commits made by any process are seen.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session],
+                 interval_seconds: float = settings.PAYMENT_EVENTS_POLL_INTERVAL_SECONDS):
+        super().__init__()
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self._last_status: Dict[int, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def publish(self, payment_id: int, event_data: dict) -> None:
+        # Local commits are published right away, the poller skips what it already saw.
+        # Only watched payments are remembered, every other commit would grow the map forever.
+        with self._lock:
+            if payment_id in self._subscribers:
+                self._last_status[payment_id] = event_data["status"]
+        super().publish(payment_id, event_data)
+
+    def _prune_statuses(self) -> Set[int]:
+        """Forget payments nobody watches any more and return the watched ones"""
+        with self._lock:
+            payment_ids = set(self._subscribers)
+            self._last_status = {payment_id: status for payment_id, status in self._last_status.items()
+                                 if payment_id in payment_ids}
+        return payment_ids
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            payment_ids = self._prune_statuses()
+            if not payment_ids:
+                continue
+            try:
+                rows = await asyncio.to_thread(self._load, payment_ids)
+            except Exception as e:
+                print(f"Payment event polling failed: {e}")
+                continue
+            for payment_id, status, trx_number in rows:
+                if self._last_status.get(payment_id, "NEW") != status:
+                    self.publish(payment_id, payment_event(payment_id, status, trx_number))
+
+    def _load(self, payment_ids: Set[int]) -> list:
+        from modles.order_models import PaymentRequest
+
+        db = self.session_factory()
+        try:
+            return db.execute(
+                select(PaymentRequest.payment_id, PaymentRequest.status, PaymentRequest.trx_number)
+                .where(PaymentRequest.payment_id.in_(payment_ids))
+            ).all()
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            stats["tracked_statuses"] = len(self._last_status)
+        return stats
+
+
+def publish_after_commit(db: Session, payment_id: int, status: str, trx_number: Optional[str] = None) -> None:
+    """Queue a payment event on the session, it is published once the transaction commits"""
+    db.info.setdefault(_PENDING_KEY, []).append(payment_event(payment_id, status, trx_number))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    for event_data in session.info.pop(_PENDING_KEY, []):
+        payment_events.publish(event_data["payment_id"], event_data)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def create_payment_event_broker() -> PaymentEventBroker:
+    if settings.PAYMENT_EVENTS_BROKER == "database":
+        from database import SessionLocal
+        return DatabasePollingPaymentEventBroker(SessionLocal)
+    return PaymentEventBroker()
+
+
+payment_events = create_payment_event_broker()
@@ -0,0 +1,144 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.catalog_cache import catalog_cache
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Title matches count this many times more than description matches
+TITLE_WEIGHT = 3
+# BM25 tuning constants
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class ProductSearchIndex:
+    """
+    In-process inverted index over product titles and descriptions with BM25 ranking.
+
+    Works the same on SQLite and PostgreSQL. It is rebuilt lazily: catalog
+    invalidations mark single products dirty (re-indexed on the next search)
+    or the whole index stale (rebuilt on the next search).
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_terms: Dict[int, Counter] = {}
+        self._doc_lengths: Dict[int, int] = {}
+        self._locations: Dict[int, str] = {}
+        self._total_length = 0
+        self._stale = True
+        self._generation = 0
+        self._dirty: Set[int] = set()
+        self._lock = threading.RLock()
+
+    @property
+    def is_stale(self) -> bool:
+        return self._stale
+
+    @property
+    def generation(self) -> int:
+        """Incremented every time the whole index is marked stale"""
+        return self._generation
+
+    def dirty_ids(self) -> Set[int]:
+        with self._lock:
+            return set(self._dirty)
+
+    def mark_stale(self, product_id: Optional[int] = None) -> None:
+        """Catalog invalidation listener: None means the whole catalog changed"""
+        with self._lock:
+            if product_id is None:
+                self._stale = True
+                self._generation += 1
+                self._dirty.clear()
+            else:
+                self._dirty.add(product_id)
+
+    def rebuild(self, rows: Iterable[Tuple[int, str, str, str]], generation: Optional[int] = None) -> None:
+        """
+        Replace the index contents with (id, title, description, location) rows.
+        Pass the generation read before loading the rows so an invalidation that
+        happened meanwhile keeps the index stale.
+        """
+        with self._lock:
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_lengths = {}
+            self._locations = {}
+            self._total_length = 0
+            for product_id, title, description, location in rows:
+                self._add(product_id, title, description, location)
+            self._stale = generation is not None and generation != self._generation
+            self._dirty.clear()
+
+    def refresh(self, product_ids: Iterable[int], rows: Iterable[Tuple[int, str, str, str]]) -> None:
+        """Re-index the given products; ids without a row are removed from the index"""
+        with self._lock:
+            product_ids = set(product_ids)
+            for product_id in product_ids:
+                self._remove(product_id)
+            for product_id, title, description, location in rows:
+                self._add(product_id, title, description, location)
+            self._dirty -= product_ids
+
+    def search(self, query: str, location: Optional[str] = None) -> List[Tuple[int, float]]:
+        """Return (product_id, score) pairs ordered by descending relevance"""
+        terms = set(tokenize(query))
+        with self._lock:
+            document_count = len(self._doc_lengths)
+            if not terms or not document_count:
+                return []
+
+            average_length = self._total_length / document_count
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for product_id, frequency in postings.items():
+                    if location and self._locations.get(product_id) != location:
+                        continue
+                    length_norm = 1 - B + B * self._doc_lengths[product_id] / average_length
+                    scores[product_id] = scores.get(product_id, 0.0) + (
+                        idf * frequency * (K1 + 1) / (frequency + K1 * length_norm)
+                    )
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def _add(self, product_id: int, title: str, description: str, location: str) -> None:
+        terms = Counter(tokenize(description))
+        for term in tokenize(title):
+            terms[term] += TITLE_WEIGHT
+
+        self._doc_terms[product_id] = terms
+        self._doc_lengths[product_id] = sum(terms.values())
+        self._locations[product_id] = location
+        self._total_length += self._doc_lengths[product_id]
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[product_id] = frequency
+
+    def _remove(self, product_id: int) -> None:
+        terms = self._doc_terms.pop(product_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(product_id, 0)
+        self._locations.pop(product_id, None)
+
+
+product_search_index = ProductSearchIndex()
+catalog_cache.add_invalidation_listener(product_search_index.mark_stale)
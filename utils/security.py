@@ -1,4 +1,6 @@
 import base64
+import hashlib
+import hmac
 
 import bcrypt
 import jwt
@@ -36,3 +38,13 @@ def create_refresh_token(data: dict):
 
 def decode_token(token: str):
     return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
+def sign_payload(secret: str, body: bytes) -> str:
+    """HMAC-SHA256 signature of a request body, as sent in the X-Signature header"""
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def verify_payload_signature(secret: str, body: bytes, signature: str) -> bool:
+    """Constant-time check of an X-Signature header against the body"""
+    return hmac.compare_digest(sign_payload(secret, body), signature or "")
@@ -0,0 +1,90 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.engine import Engine
+
+from config.setting import settings
+
+
+def copy_sqlite_database(source: Engine, target: Engine) -> None:
+    """Copy the whole source SQLite database over the target with the online backup API"""
+    source_connection = source.raw_connection()
+    target_connection = target.raw_connection()
+    try:
+        source_connection.driver_connection.backup(target_connection.driver_connection)
+    finally:
+        target_connection.close()
+        source_connection.close()
+
+
+class SqliteReplicaSync:
+    """
+    Stands in for replication when the primary and the read replica are two
+    local SQLite files: copies the primary over the replica on startup and
+    then every READ_REPLICA_SYNC_SECONDS, so reads see the schema, the
+    imported catalog and, with a lag, every later write.
+    Does nothing for other databases, which replicate on their own.
+    """
+
+    def __init__(self, primary: Engine, replica: Engine,
+                 interval_seconds: float = settings.READ_REPLICA_SYNC_SECONDS):
+        self.primary = primary
+        self.replica = replica
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.syncs = 0
+        self.failures = 0
+        self.last_sync_at: Optional[datetime] = None
+        self.last_duration_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return (self.replica is not self.primary
+                and self.primary.dialect.name == "sqlite" and self.replica.dialect.name == "sqlite")
+
+    def sync_once(self) -> None:
+        started = time.perf_counter()
+        try:
+            copy_sqlite_database(self.primary, self.replica)
+            self.last_error = None
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"SQLite replica sync failed: {e}")
+            return
+        self.syncs += 1
+        self.last_sync_at = datetime.now()
+        self.last_duration_seconds = round(time.perf_counter() - started, 3)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await asyncio.to_thread(self.sync_once)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self.sync_once()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval_seconds,
+            "syncs": self.syncs,
+            "failures": self.failures,
+            "last_sync_at": self.last_sync_at.isoformat() if self.last_sync_at else None,
+            "last_duration_seconds": self.last_duration_seconds,
+            "last_error": self.last_error
+        }